@@ -1,23 +1,96 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-from fetch_and_score import fetch_and_compute_credit_scores, get_score_breakdown_data
+from fetch_and_score import (
+    FAILURE_ERROR, FAILURE_NO_DATA, FAILURE_THROTTLED, FAILURE_UNAVAILABLE,
+    fetch_and_compute_credit_scores, get_score_breakdown_data,
+)
 from fetch_company_name import get_company_name_yfinance
 from fetch_extra_ratios import fetch_ratios_no_nans
+from quotes import LISTING_CHECKS_PATH, fetch_quotes, load_listing_checks
+from async_fetch import run_batch
+from score_store import ScoreStore
+from quantile_sketch import UniverseNormalizer
+from change_feed import ChangeLog
+from responses import json_response, to_columnar
+from unstructured import get_sentiment_model
+from lazy_imports import preload
+from profiling import RequestProfiler
+from resilience import BREAKERS, RESET_TIMEOUT, ResultCache, Revalidator
+from negative_cache import NegativeCache
+import json
 import logging
+import os
+import threading
+import time
 from datetime import datetime
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
+RequestProfiler.from_env(app)  # Opt-in profiling, enabled by PROFILE_DIR
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Libraries the scoring modules import lazily on first use
+HEAVY_MODULES = ('numpy', 'pandas', 'yfinance', 'requests', 'feedparser', 'credtech')
+
+def warm_up():
+    """Import the scoring stack and build the sentiment model before the first analysis"""
+    preload(*HEAVY_MODULES)
+    get_sentiment_model()
+    logger.info("Warm-up complete")
+
+# Warm up in the background so the health check still answers immediately
+if os.environ.get('WARM_UP_ON_START') == '1':
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+# Precomputed scores, rebuilt by `python score_store.py` (disabled if unset)
+SCORE_STORE_PATH = os.environ.get('SCORE_STORE_PATH')
+score_store = ScoreStore(
+    SCORE_STORE_PATH, max_age=float(os.environ.get('SCORE_STORE_MAX_AGE', 3600))
+) if SCORE_STORE_PATH else None
+
+# Universe quantile sketch written by `score_universe.py --sketch-out`. When set,
+# Altman/Ohlson are normalized to percentiles of that universe; live requests
+# rank against it without adding to it.
+UNIVERSE_SKETCH_PATH = os.environ.get('UNIVERSE_SKETCH_PATH')
+universe_normalizer = UniverseNormalizer.load(UNIVERSE_SKETCH_PATH, learn=False) if UNIVERSE_SKETCH_PATH else None
+
+# Listing checks saved by the batch jobs (`--listing-checks`), so that requests
+# for tickers they have seen do not download `info` just for the check
+if LISTING_CHECKS_PATH:
+    load_listing_checks(LISTING_CHECKS_PATH)
+
+# Score/grade change events pushed to dashboards (persisted if CHANGE_FEED_PATH is set).
+# With more than one worker CHANGE_FEED_PATH is required: the workers share
+# event ids through that file, without it each one numbers its own events.
+change_log = ChangeLog(
+    os.environ.get('CHANGE_FEED_PATH'), delta=float(os.environ.get('SCORE_EVENT_DELTA', 1.0))
+)
+# An open event stream occupies a sync worker, so streams are closed after this
+# long and the browser reconnects from Last-Event-ID
+SSE_MAX_SECONDS = float(os.environ.get('SSE_MAX_SECONDS', 300))
+
+# Last good analysis per ticker, served with its age while yfinance is failing
+last_good = ResultCache(int(os.environ.get('LAST_GOOD_MAX_ENTRIES', 10000)))
+revalidator = Revalidator()
+UPSTREAM_FAILURES = (FAILURE_THROTTLED, FAILURE_UNAVAILABLE)
+
+# Tickers that recently had no data or failed, rejected without calling upstream
+negative_cache = NegativeCache(ttl=float(os.environ.get('NEGATIVE_CACHE_TTL', 300)))
+NEGATIVE_FAILURES = (FAILURE_NO_DATA, FAILURE_ERROR)
+
+def refresh_requested():
+    """True if the request asks to bypass cached failures (?refresh=1)"""
+    return request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+
 @app.route('/')
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
         'service': 'Credit Score API',
+        'upstreams': {host: breaker.snapshot() for host, breaker in BREAKERS.items()},
         'timestamp': datetime.now().isoformat()
     })
 
@@ -63,39 +136,141 @@ def get_companies():
         'count': len(companies)
     })
 
+def analyze_company(ticker):
+    """
+    Live analysis of one ticker: (analysis, None), or (None, failure reason).
+    Successful analyses are kept as the ticker's last good result.
+    """
+    quotes = fetch_quotes([ticker])
+    failures = {}
+    credit_results = fetch_and_compute_credit_scores(
+        [ticker], failures=failures, normalizer=universe_normalizer, quotes=quotes
+    )
+    if ticker not in credit_results:
+        return None, failures.get(ticker, FAILURE_NO_DATA)
+    
+    change_log.record(ticker, credit_results[ticker])
+    
+    # Get company name
+    company_name = get_company_name_yfinance(ticker)
+    
+    # Get financial ratios
+    try:
+        ratios = fetch_ratios_no_nans(ticker, quotes=quotes)
+    except Exception as e:
+        logger.warning(f"Could not fetch ratios for {ticker}: {str(e)}")
+        ratios = {}
+    
+    analysis = {
+        'company_name': company_name,
+        'credit_scores': credit_results[ticker],
+        'financial_ratios': ratios,
+    }
+    last_good.put(ticker, analysis)
+    return analysis, None
+
+def stale_response(ticker):
+    """
+    Serve the last good analysis of a ticker (kept in memory, else an expired
+    store entry) marked with its age, and refresh it in the background.
+    Returns None if there is nothing to serve.
+    """
+    entry = last_good.get(ticker)
+    if entry is None and score_store is not None:
+        stored = score_store.get(ticker, max_age=float('inf'))
+        if stored is not None:
+            entry = (stored, stored['computed_at'])
+    if entry is None:
+        return None
+    
+    analysis, computed_at = entry
+    if revalidator.submit(ticker, lambda: analyze_company(ticker)):
+        logger.info(f"Serving stale analysis of {ticker}, refreshing in the background")
+    age = max(0, int(time.time() - computed_at))
+    response = jsonify({
+        'ticker': ticker,
+        'company_name': analysis['company_name'],
+        'credit_scores': analysis['credit_scores'],
+        'financial_ratios': analysis['financial_ratios'],
+        'breakdown': get_score_breakdown_data(),
+        'success': True,
+        'stale': True,
+        'age_seconds': age,
+        'as_of': datetime.fromtimestamp(computed_at).isoformat(),
+        'timestamp': datetime.now().isoformat()
+    })
+    response.headers['Age'] = str(age)
+    return response
+
 @app.route('/api/company-analysis/<ticker>')
 def company_analysis(ticker):
-    """Get complete analysis for a specific company"""
+    """
+    Get complete analysis for a specific company.
+
+    While yfinance is failing (its circuit breaker is not closed), the last
+    good analysis is returned straight away with "stale": true and its age.
+    Tickers that recently had no data are rejected from the negative cache
+    until it expires or ``?refresh=1`` is passed.
+    """
     try:
         ticker = ticker.upper()
-        logger.info(f"Analyzing ticker: {ticker}")
         
-        # Get company name
-        company_name = get_company_name_yfinance(ticker)
+        if refresh_requested():
+            negative_cache.invalidate(ticker)
+        cached_failure = negative_cache.get(ticker)
+        if cached_failure is not None:
+            reason, expires_in = cached_failure
+            return jsonify({
+                'error': f'No financial data available for {ticker}. Please check the ticker symbol.',
+                'reason': reason,
+                'cached': True
+            }), 404, {'Cache-Control': f'max-age={int(expires_in)}'}
+        
+        # Serve from the precomputed store when it has a fresh entry
+        stored = score_store.get(ticker) if score_store is not None else None
+        if stored is not None:
+            # Not recorded in the change feed: the rebuild that computed it already did
+            return jsonify({
+                'ticker': ticker,
+                'company_name': stored['company_name'],
+                'credit_scores': stored['credit_scores'],
+                'financial_ratios': stored['financial_ratios'],
+                'breakdown': get_score_breakdown_data(),
+                'success': True,
+                'as_of': datetime.fromtimestamp(stored['computed_at']).isoformat(),
+                'timestamp': datetime.now().isoformat()
+            })
         
-        # Get credit scores for the ticker
-        credit_results = fetch_and_compute_credit_scores([ticker])
+        if not BREAKERS['yfinance'].closed:
+            stale = stale_response(ticker)
+            if stale is not None:
+                return stale
         
-        if ticker not in credit_results:
+        logger.info(f"Analyzing ticker: {ticker}")
+        analysis, reason = analyze_company(ticker)
+        
+        if analysis is None:
+            if reason in UPSTREAM_FAILURES:
+                stale = stale_response(ticker)
+                if stale is not None:
+                    return stale
+                retry_after = max(1, int(BREAKERS['yfinance'].retry_in() or RESET_TIMEOUT))
+                return jsonify({
+                    'error': f'Market data for {ticker} is temporarily unavailable. Please retry shortly.'
+                }), 503, {'Retry-After': str(retry_after)}
+            if reason in NEGATIVE_FAILURES:
+                negative_cache.add(ticker, reason)
             return jsonify({
-                'error': f'No financial data available for {ticker}. Please check the ticker symbol.'
+                'error': f'No financial data available for {ticker}. Please check the ticker symbol.',
+                'reason': reason
             }), 404
         
-        # Get financial ratios
-        try:
-            ratios = fetch_ratios_no_nans(ticker)
-        except Exception as e:
-            logger.warning(f"Could not fetch ratios for {ticker}: {str(e)}")
-            ratios = {}
-        
         # Get breakdown data
         breakdown_data = get_score_breakdown_data()
         
         response_data = {
             'ticker': ticker,
-            'company_name': company_name,
-            'credit_scores': credit_results[ticker],
-            'financial_ratios': ratios,
+            **analysis,
             'breakdown': breakdown_data,
             'success': True,
             'timestamp': datetime.now().isoformat()
@@ -112,14 +287,26 @@ def company_analysis(ticker):
 
 @app.route('/api/batch-analysis', methods=['POST'])
 def batch_analysis():
-    """Analyze multiple companies at once"""
+    """
+    Analyze multiple companies at once.
+
+    Optional body fields: "shape" ("rows", the default, or "columns" for
+    arrays per field) and "include_breakdown" (default true). Tickers in the
+    negative cache are not analyzed and are listed under "skipped" with
+    their reason; ``?refresh=1`` clears their entries first.
+    """
     try:
         data = request.get_json()
         tickers = data.get('tickers', [])
+        shape = data.get('shape', 'rows')
+        include_breakdown = data.get('include_breakdown', True)
         
         if not tickers:
             return jsonify({'error': 'No tickers provided'}), 400
         
+        if shape not in ('rows', 'columns'):
+            return jsonify({'error': 'shape must be "rows" or "columns"'}), 400
+        
         # Limit batch size for performance
         if len(tickers) > 10:
             return jsonify({'error': 'Maximum 10 tickers per batch'}), 400
@@ -127,34 +314,33 @@ def batch_analysis():
         # Convert to uppercase
         tickers = [ticker.upper() for ticker in tickers]
         
-        # Get credit scores
-        credit_results = fetch_and_compute_credit_scores(tickers)
-        
-        # Get company names and ratios for each ticker
-        results = {}
-        for ticker in credit_results.keys():
-            try:
-                company_name = get_company_name_yfinance(ticker)
-                try:
-                    ratios = fetch_ratios_no_nans(ticker)
-                except:
-                    ratios = {}
-                
-                results[ticker] = {
-                    'company_name': company_name,
-                    'credit_scores': credit_results[ticker],
-                    'financial_ratios': ratios
-                }
-            except Exception as e:
-                logger.warning(f"Error processing {ticker}: {str(e)}")
-                continue
+        skipped = {}
+        for ticker in tickers:
+            if refresh_requested():
+                negative_cache.invalidate(ticker)
+            cached_failure = negative_cache.get(ticker)
+            if cached_failure is not None:
+                skipped[ticker] = cached_failure[0]
+        to_analyze = [ticker for ticker in tickers if ticker not in skipped]
+        
+        # Score, fetch ratios and names for all tickers concurrently
+        failures = {}
+        results = run_batch(to_analyze, normalizer=universe_normalizer, failures=failures) if to_analyze else {}
+        for ticker, analysis in results.items():
+            change_log.record(ticker, analysis['credit_scores'])
+            last_good.put(ticker, analysis)
+        for ticker, reason in failures.items():
+            if reason in NEGATIVE_FAILURES:
+                negative_cache.add(ticker, reason)
         
         # Get breakdown data
-        breakdown_data = get_score_breakdown_data()
+        breakdown_data = get_score_breakdown_data() if include_breakdown else None
         
-        return jsonify({
-            'results': results,
+        return json_response({
+            'results': to_columnar(results) if shape == 'columns' else results,
+            'shape': shape,
             'breakdown': breakdown_data,
+            'skipped': skipped,
             'processed_count': len(results),
             'requested_count': len(tickers),
             'success': True,
@@ -174,5 +360,56 @@ def chart_data():
         logger.error(f"Error getting chart data: {str(e)}")
         return jsonify({'error': 'Failed to load chart data'}), 500
 
+def _event_params():
+    """Cursor (Last-Event-ID header or ?cursor=) and optional ?tickers= filter"""
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor') or change_log.latest_cursor()
+    tickers = request.args.get('tickers')
+    tickers = {t.strip().upper() for t in tickers.split(',') if t.strip()} if tickers else None
+    return int(cursor), tickers
+
+@app.route('/api/score-events')
+def score_events():
+    """
+    Server-sent events for score and grade changes, resumable by event id.
+
+    Each stream ends after SSE_MAX_SECONDS; EventSource reconnects on its
+    own. Clients that cannot hold a connection should use the long-poll
+    endpoint below.
+    """
+    try:
+        cursor, tickers = _event_params()
+    except ValueError:
+        return jsonify({'error': 'cursor must be an integer'}), 400
+
+    def stream(cursor):
+        yield 'retry: 5000\n\n'
+        deadline = time.monotonic() + SSE_MAX_SECONDS
+        while time.monotonic() < deadline:
+            events, cursor = change_log.wait(
+                cursor, timeout=min(15, max(deadline - time.monotonic(), 0)), tickers=tickers
+            )
+            if not events:
+                # Also lets the server notice closed connections; the id moves the
+                # reconnect cursor past events the ticker filter skipped
+                yield f"id: {cursor}\n: keep-alive\n\n"
+            for event in events:
+                yield f"id: {event['id']}\nevent: score-change\ndata: {json.dumps(event)}\n\n"
+
+    return Response(stream(cursor), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@app.route('/api/score-events/poll')
+def poll_score_events():
+    """Long-poll variant of /api/score-events: waits up to ?timeout= seconds"""
+    try:
+        cursor, tickers = _event_params()
+        timeout = min(float(request.args.get('timeout', 25)), 60)
+    except ValueError:
+        return jsonify({'error': 'cursor and timeout must be numbers'}), 400
+    events, cursor = change_log.wait(cursor, timeout=timeout, tickers=tickers)
+    return jsonify({'events': events, 'cursor': cursor})
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
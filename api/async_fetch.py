@@ -0,0 +1,285 @@
+"""
+Asyncio fetch layer for the scoring pipeline.
+
+yfinance, feedparser and the FinBERT pipeline are all blocking, so each upstream
+call runs on a shared thread pool while one event loop coordinates them. Calls
+are gated by a per-host semaphore (see ``http_pool.HOST_LIMITS``) and go through
+pooled, kept-alive sessions; inside the worker threads, ``rate_limit`` applies
+the same token buckets and retry budget as the sync path. One ``yf.Ticker`` is
+shared per symbol, so the statements and info downloaded for scoring are reused
+for ratios and names.
+
+Async Flask views (or an ASGI adapter) can await these coroutines directly;
+sync callers use ``run_batch``.
+"""
+import asyncio
+import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional
+
+from lazy_imports import lazy_import
+from http_pool import HOST_LIMITS
+from fetch_and_score import (
+    FAILURE_ERROR, FAILURE_NO_DATA, FAILURE_THROTTLED, FAILURE_UNAVAILABLE, score_financials
+)
+from rate_limit import RetryBudget, UpstreamThrottled, yf_attr
+from resilience import CircuitOpenError, is_outage
+from fetch_extra_ratios import compute_ratio_values, compute_ratios
+from fetch_company_name import company_name_from_info
+from statements import fetch_statement
+from quotes import LazyInfo, fetch_quotes
+from quantile_sketch import UniverseNormalizer
+from unstructured import fetch_headlines, score_headlines
+
+logger = logging.getLogger(__name__)
+
+yf = lazy_import("yfinance")
+
+_io_executor = ThreadPoolExecutor(
+    max_workers=sum(HOST_LIMITS.values()), thread_name_prefix="upstream"
+)
+# The sentiment model is not re-entrant, so inference is serialized on one thread
+_inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sentiment")
+
+# asyncio semaphores are bound to the loop that first uses them
+_loop_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+_RATIO_STATEMENTS = ("balance_sheet", "quarterly_balance_sheet", "financials", "quarterly_financials")
+
+
+def _host_semaphore(host: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphores = _loop_semaphores.get(loop)
+    if semaphores is None:
+        semaphores = {name: asyncio.Semaphore(limit) for name, limit in HOST_LIMITS.items()}
+        _loop_semaphores[loop] = semaphores
+    return semaphores[host]
+
+
+async def _call(host: str, fn, *args):
+    """Run a blocking upstream call on the I/O pool, within the host's concurrency limit."""
+    async with _host_semaphore(host):
+        return await asyncio.get_running_loop().run_in_executor(_io_executor, fn, *args)
+
+
+async def fetch_statements_async(ticker: str, stock=None, budget: Optional[RetryBudget] = None):
+    """Fetch the quarterly balance sheet and income statement concurrently, plus a lazy info."""
+    info = LazyInfo(ticker, budget, stock)
+    stock = stock if stock is not None else yf.Ticker(ticker)
+    quarterly_bs, quarterly_income = await asyncio.gather(
+        _call("yfinance", fetch_statement, stock, "quarterly_balance_sheet", budget),
+        _call("yfinance", fetch_statement, stock, "quarterly_financials", budget),
+    )
+    return quarterly_bs, quarterly_income, info
+
+
+async def news_sentiment_score_async(ticker: str, budget: Optional[RetryBudget] = None) -> float:
+    """Async counterpart of ``unstructured.news_sentiment_score``."""
+    try:
+        headlines = await _call("news.google.com", fetch_headlines, ticker, 20, budget)
+        return await asyncio.get_running_loop().run_in_executor(
+            _inference_executor, score_headlines, ticker, headlines
+        )
+    except Exception as e:
+        logger.error(f"Error getting sentiment for {ticker}: {e}")
+        return 0.5  # Neutral default on error
+
+
+async def _ratios_async(compute, ticker: str, stock, budget: Optional[RetryBudget], quote: Optional[dict]):
+    stock = stock if stock is not None else yf.Ticker(ticker)
+    bal_yr, bal_q, inc_yr, inc_q = await asyncio.gather(
+        *(_call("yfinance", fetch_statement, stock, attr, budget) for attr in _RATIO_STATEMENTS)
+    )
+    fast = getattr(stock, "fast_info", {}) or {}
+    # fast_info and info are resolved lazily, so the computation itself may hit the network
+    return await _call("yfinance", partial(
+        compute, ticker,
+        bal_yr=bal_yr, bal_q=bal_q, inc_yr=inc_yr, inc_q=inc_q,
+        info=LazyInfo(ticker, budget, stock), fast=fast, quote=quote,
+    ))
+
+
+async def fetch_ratios_async(
+    ticker: str, stock=None, budget: Optional[RetryBudget] = None, quote: Optional[dict] = None
+) -> Dict[str, str]:
+    """Async counterpart of ``fetch_extra_ratios.fetch_ratios_no_nans``."""
+    return await _ratios_async(compute_ratios, ticker, stock, budget, quote)
+
+
+async def fetch_ratio_values_async(
+    ticker: str, stock=None, budget: Optional[RetryBudget] = None, quote: Optional[dict] = None
+):
+    """Numeric ratios and their sources, as returned by ``compute_ratio_values``."""
+    return await _ratios_async(compute_ratio_values, ticker, stock, budget, quote)
+
+
+async def _score_ticker(ticker: str, stock, weights, budget, normalizer, quote) -> Optional[Dict[str, float]]:
+    (quarterly_bs, quarterly_income, info), sentiment_score = await asyncio.gather(
+        fetch_statements_async(ticker, stock, budget),
+        news_sentiment_score_async(ticker, budget),
+    )
+    # Scoring reads info only if the quote is missing, but that read is a download
+    return await _call("yfinance", partial(
+        score_financials, ticker, quarterly_bs, quarterly_income, info, sentiment_score,
+        *weights, normalizer, quote,
+    ))
+
+
+async def fetch_and_compute_credit_scores_async(
+    tickers: List[str],
+    weight_altman: float = 0.50,
+    weight_ohlson: float = 0.40,
+    weight_sentiment: float = 0.10,
+    stocks: Optional[Dict[str, object]] = None,
+    failures: Optional[Dict[str, str]] = None,
+    retry_budget: Optional[RetryBudget] = None,
+    normalizer: Optional[UniverseNormalizer] = None,
+    quotes: Optional[Dict[str, dict]] = None,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Async counterpart of ``fetch_and_score.fetch_and_compute_credit_scores``.
+
+    Pass ``stocks`` to keep each ``yf.Ticker`` (and the raw responses it
+    caches) for reuse after scoring. Otherwise each ticker's ``yf.Ticker`` is
+    dropped as soon as its statements are fetched and compacted.
+
+    Prices for all tickers are fetched in one batch unless ``quotes`` are given.
+    """
+    keep_stocks = stocks is not None
+    failures = failures if failures is not None else {}
+    budget = retry_budget if retry_budget is not None else RetryBudget.for_job(len(tickers))
+    if quotes is None:
+        quotes = await _call("yfinance", fetch_quotes, list(tickers), budget)
+    weights = (weight_altman, weight_ohlson, weight_sentiment)
+    results = {}
+
+    async def score_all(batch: List[str]) -> List[str]:
+        if keep_stocks:
+            for ticker in batch:
+                if ticker not in stocks:
+                    stocks[ticker] = yf.Ticker(ticker)
+        outcomes = await asyncio.gather(
+            *(_score_ticker(t, stocks[t] if keep_stocks else None, weights, budget, normalizer, quotes.get(t))
+              for t in batch),
+            return_exceptions=True,
+        )
+        throttled = []
+        for ticker, outcome in zip(batch, outcomes):
+            if isinstance(outcome, UpstreamThrottled):
+                logger.warning(f"Deferring {ticker}: {str(outcome)}")
+                throttled.append(ticker)
+            elif isinstance(outcome, CircuitOpenError):
+                logger.warning(f"Skipping {ticker}: {str(outcome)}")
+                failures[ticker] = FAILURE_UNAVAILABLE
+            elif isinstance(outcome, Exception):
+                logger.error(f"Failed to process {ticker}: {str(outcome)}")
+                failures[ticker] = FAILURE_UNAVAILABLE if is_outage(outcome, False) else FAILURE_ERROR
+            elif outcome is None:
+                failures[ticker] = FAILURE_NO_DATA
+            else:
+                results[ticker] = outcome
+        return throttled
+
+    deferred = await score_all(list(tickers))
+    if deferred:
+        logger.info(f"Retrying {len(deferred)} throttled tickers")
+        for ticker in await score_all(deferred):
+            failures[ticker] = FAILURE_THROTTLED
+
+    if failures:
+        logger.warning(f"Failed tickers: {failures}")
+
+    logger.info(f"Processed {len(results)} of {len(tickers)}")
+    return results
+
+
+async def _analyze_ticker(ticker: str, stock, credit_scores, budget, numeric_ratios: bool, quote) -> dict:
+    analysis = {'credit_scores': credit_scores}
+    try:
+        if numeric_ratios:
+            analysis['financial_ratios'], analysis['ratio_sources'] = await fetch_ratio_values_async(
+                ticker, stock, budget, quote
+            )
+        else:
+            analysis['financial_ratios'] = await fetch_ratios_async(ticker, stock, budget, quote)
+    except Exception as e:
+        logger.warning(f"Could not fetch ratios for {ticker}: {str(e)}")
+        analysis['financial_ratios'] = {}
+        if numeric_ratios:
+            analysis['ratio_sources'] = {}
+    # The company name is the one field that needs the full info payload
+    try:
+        info = await _call("yfinance", yf_attr, stock, "info", budget)
+        analysis['company_name'] = company_name_from_info(ticker, info)
+    except Exception as e:
+        # Same fallback as fetch_company_name.get_company_name_yfinance
+        logger.error(f"Error fetching data for {ticker}: {str(e)}")
+        analysis['company_name'] = f"Error fetching data for {ticker}: {str(e)}"
+    return analysis
+
+
+async def analyze_tickers_async(
+    tickers: List[str],
+    failures: Optional[Dict[str, str]] = None,
+    numeric_ratios: bool = False,
+    normalizer: Optional[UniverseNormalizer] = None,
+) -> Dict[str, dict]:
+    """
+    Score, fetch ratios and resolve names for many tickers on one event loop.
+
+    Returns a mapping of ticker -> {company_name, credit_scores, financial_ratios}
+    for every ticker that could be scored. With ``numeric_ratios`` the ratios
+    are floats (None when unavailable) and a ``ratio_sources`` entry is added.
+    Tickers that could not be scored are recorded in ``failures``.
+    ``normalizer`` is passed on to ``score_financials``.
+    """
+    stocks: Dict[str, object] = {}
+    failures = failures if failures is not None else {}
+    budget = RetryBudget.for_job(len(tickers))
+    quotes = await _call("yfinance", fetch_quotes, list(tickers), budget)
+    credit_results = await fetch_and_compute_credit_scores_async(
+        tickers, stocks=stocks, failures=failures, retry_budget=budget, normalizer=normalizer, quotes=quotes
+    )
+    scored = list(credit_results)
+    # Hand each Ticker (and the statements it cached) to its own analysis only,
+    # so it is freed when that analysis finishes rather than with the whole batch
+    pending = [
+        _analyze_ticker(t, stocks.pop(t), credit_results[t], budget, numeric_ratios, quotes.get(t)) for t in scored
+    ]
+    stocks.clear()
+    analyses = await asyncio.gather(*pending, return_exceptions=True)
+    del pending
+
+    results = {}
+    for ticker, analysis in zip(scored, analyses):
+        if isinstance(analysis, Exception):
+            logger.warning(f"Error processing {ticker}: {str(analysis)}")
+            failures[ticker] = FAILURE_ERROR
+            continue
+        results[ticker] = analysis
+    return results
+
+
+def run_batch(
+    tickers: List[str],
+    normalizer: Optional[UniverseNormalizer] = None,
+    failures: Optional[Dict[str, str]] = None,
+) -> Dict[str, dict]:
+    """Blocking entry point for sync callers such as the Flask batch view."""
+    return asyncio.run(analyze_tickers_async(tickers, failures=failures, normalizer=normalizer))
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    batch = run_batch(['AAPL', 'GOOGL', 'MSFT'])
+    for ticker, analysis in batch.items():
+        scores = analysis['credit_scores']
+        print(f"{ticker} ({analysis['company_name']}): Base Score = {scores['base_score']}, "
+              f"Grade = {scores['grade']}")
+    print(f"Analyzed {len(batch)} tickers in {time.perf_counter() - start:.2f}s")
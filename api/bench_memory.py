@@ -0,0 +1,125 @@
+"""
+Memory benchmark for per-ticker statement storage in bulk runs.
+
+Compares peak RSS of holding every ticker's four statements (annual and
+quarterly balance sheet and income statement) as the DataFrames yfinance
+returns ("frames", the old representation) against reducing each one to a
+``CompactStatement`` as it arrives ("compact"). Statements are synthetic but
+shaped like yfinance's: the same line-item labels, datetime period columns,
+float64 values. Each mode runs in a fresh interpreter and the result is
+reported per 1,000 tickers, which is roughly what a bulk shard holds in flight.
+
+Usage:
+    python bench_memory.py --tickers 1000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import List, Optional
+
+MODES = ('frames', 'compact')
+
+# Labels as yfinance reports them for a typical large cap
+BALANCE_SHEET_ITEMS = [
+    'Treasury Shares Number', 'Ordinary Shares Number', 'Share Issued', 'Net Debt', 'Total Debt',
+    'Tangible Book Value', 'Invested Capital', 'Working Capital', 'Net Tangible Assets',
+    'Capital Lease Obligations', 'Common Stock Equity', 'Total Capitalization',
+    'Total Equity Gross Minority Interest', 'Stockholders Equity',
+    'Gains Losses Not Affecting Retained Earnings', 'Other Equity Adjustments', 'Retained Earnings',
+    'Capital Stock', 'Common Stock', 'Total Liabilities Net Minority Interest',
+    'Total Non Current Liabilities Net Minority Interest', 'Other Non Current Liabilities',
+    'Tradeand Other Payables Non Current', 'Long Term Debt And Capital Lease Obligation',
+    'Long Term Capital Lease Obligation', 'Long Term Debt', 'Current Liabilities',
+    'Other Current Liabilities', 'Current Deferred Liabilities', 'Current Deferred Revenue',
+    'Current Debt And Capital Lease Obligation', 'Current Capital Lease Obligation', 'Current Debt',
+    'Other Current Borrowings', 'Commercial Paper', 'Payables And Accrued Expenses', 'Payables',
+    'Total Tax Payable', 'Income Tax Payable', 'Accounts Payable', 'Total Assets',
+    'Total Non Current Assets', 'Other Non Current Assets', 'Non Current Deferred Assets',
+    'Non Current Deferred Taxes Assets', 'Investments And Advances', 'Other Investments',
+    'Investmentin Financial Assets', 'Available For Sale Securities', 'Net PPE',
+    'Accumulated Depreciation', 'Gross PPE', 'Leases', 'Other Properties',
+    'Machinery Furniture Equipment', 'Land And Improvements', 'Properties', 'Current Assets',
+    'Other Current Assets', 'Inventory', 'Receivables', 'Other Receivables', 'Accounts Receivable',
+    'Cash Cash Equivalents And Short Term Investments', 'Other Short Term Investments',
+    'Cash And Cash Equivalents', 'Cash Equivalents', 'Cash Financial',
+]
+INCOME_STATEMENT_ITEMS = [
+    'Tax Effect Of Unusual Items', 'Tax Rate For Calcs', 'Normalized EBITDA',
+    'Net Income From Continuing Operation Net Minority Interest', 'Reconciled Depreciation',
+    'Reconciled Cost Of Revenue', 'EBITDA', 'EBIT', 'Net Interest Income', 'Interest Expense',
+    'Interest Income', 'Normalized Income', 'Net Income From Continuing And Discontinued Operation',
+    'Total Expenses', 'Total Operating Income As Reported', 'Diluted Average Shares',
+    'Basic Average Shares', 'Diluted EPS', 'Basic EPS', 'Diluted NI Availto Com Stockholders',
+    'Net Income Common Stockholders', 'Net Income', 'Net Income Including Noncontrolling Interests',
+    'Net Income Continuous Operations', 'Tax Provision', 'Pretax Income', 'Other Income Expense',
+    'Other Non Operating Income Expenses', 'Net Non Operating Interest Income Expense',
+    'Interest Expense Non Operating', 'Interest Income Non Operating', 'Operating Income',
+    'Operating Expense', 'Research And Development', 'Selling General And Administration',
+    'Gross Profit', 'Cost Of Revenue', 'Total Revenue', 'Operating Revenue',
+]
+
+_PROBE = """
+import json, resource, sys
+import numpy as np
+import pandas as pd
+from statements import CompactStatement
+
+mode, count = sys.argv[1], int(sys.argv[2])
+balance_items, income_items = json.loads(sys.argv[3])
+rng = np.random.default_rng(0)
+
+def statement(items, periods, freq):
+    # Labels are copied per frame, as each yfinance response parses its own
+    columns = pd.date_range(end='2025-06-30', periods=periods, freq=freq)[::-1]
+    index = pd.Index([str(label + ' ')[:-1] for label in items], dtype=object)
+    return pd.DataFrame(rng.normal(1e9, 1e8, (len(items), periods)), index=index, columns=columns)
+
+def fetch():
+    return [
+        statement(balance_items, 5, 'YE'), statement(balance_items, 6, 'QE'),
+        statement(income_items, 5, 'YE'), statement(income_items, 6, 'QE'),
+    ]
+
+CompactStatement.from_frame(fetch()[0])  # import and warm up before the baseline
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+held = []
+for _ in range(count):
+    frames = fetch()
+    held.append(frames if mode == 'frames' else [CompactStatement.from_frame(f) for f in frames])
+    del frames
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'mode': mode, 'tickers': count, 'peak_kb': peak, 'delta_kb': peak - baseline}))
+"""
+
+
+def measure(mode: str, tickers: int) -> dict:
+    """Hold ``tickers`` tickers' statements in ``mode`` in a fresh interpreter."""
+    api_dir = os.path.dirname(os.path.abspath(__file__))
+    items = json.dumps([BALANCE_SHEET_ITEMS, INCOME_STATEMENT_ITEMS])
+    output = subprocess.run(
+        [sys.executable, '-c', _PROBE, mode, str(tickers), items], cwd=api_dir,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark statement memory per 1,000 tickers.")
+    parser.add_argument('--tickers', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    results = {mode: measure(mode, args.tickers) for mode in MODES}
+    for mode in MODES:
+        per_thousand = results[mode]['delta_kb'] / 1024 * 1000 / args.tickers
+        print(f"{mode:>8}: peak RSS {results[mode]['peak_kb'] / 1024:7.1f} MB, "
+              f"statements {per_thousand:6.1f} MB per 1,000 tickers")
+    frames, compact = (results[mode]['delta_kb'] for mode in MODES)
+    if compact:
+        print(f"compact statements use {frames / compact:.1f}x less memory")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
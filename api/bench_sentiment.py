@@ -0,0 +1,124 @@
+"""
+Benchmark and parity check for the FinBERT inference backends.
+
+Each backend runs in its own process so its resident memory can be measured
+in isolation. Labels from every backend are compared with the fp32 "torch"
+backend; a backend passes if its label agreement meets --min-agreement.
+
+Usage:
+    python bench_sentiment.py --model-dir ./models/finbert --headlines headlines.txt
+    python bench_sentiment.py --backends torch,int8 --repeat 5 --min-agreement 0.98
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+from typing import Dict, List, Optional
+
+SAMPLE_HEADLINES = [
+    "Apple shares rise after earnings beat estimates",
+    "Tesla stock falls as deliveries miss expectations",
+    "Microsoft announces quarterly dividend",
+    "Intel warns of weaker demand, shares slump",
+    "Amazon expands same-day delivery to new cities",
+    "Netflix subscriber growth slows in latest quarter",
+    "NVIDIA hits record high on AI chip demand",
+    "Regulators open probe into Meta advertising practices",
+    "Alphabet reports steady revenue growth",
+    "Adobe cuts full-year guidance amid softer spending",
+]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_backend(backend: str, model_dir: str, headlines: List[str], repeat: int, batch_size: int) -> dict:
+    from unstructured import load_sentiment_model
+
+    start = time.perf_counter()
+    model = load_sentiment_model(backend, model_dir)
+    load_seconds = time.perf_counter() - start
+
+    labels = [r["label"].lower() for r in model(headlines, batch_size=batch_size)]  # also warms up
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        model(headlines, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "headlines_per_sec": round(len(headlines) * repeat / elapsed, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "labels": labels,
+    }
+
+
+def benchmark(
+    backends: List[str],
+    model_dir: str,
+    headlines: List[str],
+    repeat: int = 3,
+    batch_size: int = 16,
+) -> Dict[str, dict]:
+    """Run every backend in a fresh process and add label agreement vs fp32."""
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for backend in dict.fromkeys(["torch"] + backends):  # fp32 reference first
+        with ctx.Pool(1) as pool:
+            results[backend] = pool.apply(_run_backend, (backend, model_dir, headlines, repeat, batch_size))
+
+    reference = results["torch"]["labels"]
+    for result in results.values():
+        same = sum(a == b for a, b in zip(result["labels"], reference))
+        result["label_agreement"] = round(same / len(reference), 4)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from unstructured import FINBERT_MODEL, SENTIMENT_BACKENDS
+
+    parser = argparse.ArgumentParser(description="Benchmark FinBERT inference backends.")
+    parser.add_argument("--backends", default=",".join(SENTIMENT_BACKENDS),
+                        help="Comma-separated backends to compare against fp32 torch")
+    parser.add_argument("--model-dir", default=FINBERT_MODEL, help="Local FinBERT model directory")
+    parser.add_argument("--headlines", help="File with one headline per line (default: built-in sample)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--min-agreement", type=float, default=0.97,
+                        help="Minimum label agreement with fp32 for a backend to pass")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.headlines:
+        with open(args.headlines) as f:
+            headlines = [line.strip() for line in f if line.strip()]
+    else:
+        headlines = SAMPLE_HEADLINES
+
+    results = benchmark(args.backends.split(","), args.model_dir, headlines, args.repeat, args.batch_size)
+    passing = {b: r for b, r in results.items() if r["label_agreement"] >= args.min_agreement}
+    best = max(passing, key=lambda b: passing[b]["headlines_per_sec"]) if passing else None
+
+    if args.json:
+        for result in results.values():
+            result.pop("labels")
+        print(json.dumps({"results": results, "recommended": best}, indent=2))
+    else:
+        print(f"{'backend':<8} {'headlines/s':>12} {'peak RSS MB':>12} {'load s':>8} {'agreement':>10}")
+        for backend, r in results.items():
+            flag = "" if backend in passing else "  (below threshold)"
+            print(f"{backend:<8} {r['headlines_per_sec']:>12} {r['peak_rss_mb']:>12} "
+                  f"{r['load_seconds']:>8} {r['label_agreement']:>10.2%}{flag}")
+        print(f"\nRecommended backend: {best or 'none'} (min agreement {args.min_agreement:.0%})")
+    return 0 if best else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
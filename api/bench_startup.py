@@ -0,0 +1,74 @@
+"""
+Start-up benchmark for the API.
+
+Measures, in a fresh interpreter each run, the time from process start until
+the health check (/) has answered, and checks that none of the heavy scoring
+libraries were imported on the way. Exits non-zero if the median exceeds
+--max-seconds or a heavy module leaked into start-up, so it can run in CI.
+
+Usage:
+    python bench_startup.py --runs 5 --max-seconds 0.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import List, Optional
+
+# Modules that must not be imported just to answer the health check
+HEAVY_MODULES = ('numpy', 'pandas', 'yfinance', 'transformers', 'torch', 'pydantic', 'feedparser')
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+client = app.app.test_client()
+status = client.get('/').status_code
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'status': status,
+    'heavy_loaded': [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def measure_once() -> dict:
+    """Import app and hit / in a fresh interpreter."""
+    api_dir = os.path.dirname(os.path.abspath(__file__))
+    env = {k: v for k, v in os.environ.items() if k != 'WARM_UP_ON_START'}
+    output = subprocess.run(
+        [sys.executable, '-c', _PROBE], cwd=api_dir, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark API start-up to first health check.")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=0.5,
+                        help="Fail if the median start-up time exceeds this")
+    args = parser.parse_args(argv)
+
+    runs = [measure_once() for _ in range(args.runs)]
+    times = [run['seconds'] for run in runs]
+    median = statistics.median(times)
+    leaked = sorted({m for run in runs for m in run['heavy_loaded']})
+
+    print(f"start-up to first '/' response over {args.runs} runs: "
+          f"median {median * 1000:.0f} ms, min {min(times) * 1000:.0f} ms, max {max(times) * 1000:.0f} ms")
+    if leaked:
+        print(f"FAIL: heavy modules imported at start-up: {', '.join(leaked)}")
+    if median > args.max_seconds:
+        print(f"FAIL: median exceeds {args.max_seconds * 1000:.0f} ms")
+    if any(run['status'] != 200 for run in runs):
+        print("FAIL: health check did not return 200")
+        return 1
+    return 1 if leaked or median > args.max_seconds else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Append-only log of credit score changes, for push updates to dashboards.
+
+Every score the API computes is offered to ``ChangeLog.record``. An event is
+appended only when the ticker's ``base_score`` has moved by at least ``delta``
+points since its last event, or its grade has changed; otherwise the score is
+dropped. The first score seen for a ticker sets its baseline without an event.
+Only freshly computed scores should be offered, not reads of stored ones.
+
+Events carry increasing integer ids, which clients use as a resume cursor
+(SSE ``Last-Event-ID`` or ``?cursor=``). The most recent ``max_events`` are
+kept in memory. With a ``path`` every event is also appended to a JSONL file
+and replayed at start-up, so cursors survive restarts. New baselines are
+written to the file too (as lines without an id), so a score computed by any
+process - an API worker or a store rebuild - is compared with the same one.
+
+The file is also what lets several workers share one feed: ``record`` takes
+an exclusive lock on it, reads the events other workers have appended since
+it last looked, and only then assigns the next id and checks the baseline.
+Readers catch up from the file before answering, so every worker hands out
+the same ids and a cursor from one is valid on all. Without a ``path`` the
+feed is per process and must only be used with a single worker.
+"""
+import json
+import logging
+import threading
+import time
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; there the file is not shared between workers
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DELTA = 1.0
+DEFAULT_MAX_EVENTS = 10000
+# How often a waiting reader checks the file for other workers' events
+SYNC_INTERVAL = 0.5
+
+
+class ChangeLog:
+    """In-memory (optionally file-backed) log of score and grade changes."""
+
+    def __init__(self, path: Optional[str] = None, delta: float = DEFAULT_DELTA,
+                 max_events: int = DEFAULT_MAX_EVENTS):
+        self.path = path
+        self.delta = delta
+        self.max_events = max_events
+        self._events: List[dict] = []
+        self._ids: List[int] = []
+        self._next_id = 1
+        self._baselines: Dict[str, Tuple[float, str]] = {}
+        self._offset = 0  # bytes of the file already read into memory
+        self._changed = threading.Condition()
+        if path:
+            with self._changed:
+                self._sync()
+            logger.info(f"Replayed {self._next_id - 1} score events from {self.path}")
+
+    def _sync(self, f=None) -> bool:
+        """Read events appended to the file since the last sync; True if there were any. Call with the lock held."""
+        if not self.path:
+            return False
+        try:
+            if f is None:
+                with open(self.path, 'rb') as f:
+                    return self._sync(f)
+            f.seek(self._offset)
+            data = f.read()
+        except FileNotFoundError:
+            return False
+        # A line without its newline is still being written by another worker
+        end = data.rfind(b'\n') + 1
+        found = False
+        for line in data[:end].splitlines():
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping corrupt change log line in {self.path}")
+                continue
+            if 'id' not in event:
+                self._baselines[event['ticker']] = (event['base_score'], event['grade'])
+            elif event['id'] >= self._next_id:
+                self._append(event)
+                found = True
+        self._offset += end
+        return found
+
+    def _append(self, event: dict) -> None:
+        self._events.append(event)
+        self._ids.append(event['id'])
+        if len(self._events) > self.max_events:
+            del self._events[:len(self._events) - self.max_events]
+            del self._ids[:len(self._ids) - self.max_events]
+        self._next_id = event['id'] + 1
+        self._baselines[event['ticker']] = (event['base_score'], event['grade'])
+
+    @property
+    def cursor(self) -> int:
+        """Id of the latest event (0 if there are none)"""
+        return self._next_id - 1
+
+    def latest_cursor(self) -> int:
+        """``cursor`` after catching up with events other workers have written"""
+        with self._changed:
+            self._sync()
+            return self.cursor
+
+    def record(self, ticker: str, credit_scores: dict) -> Optional[dict]:
+        """Offer a freshly computed score; returns the event if one was appended."""
+        with self._changed:
+            if not self.path:
+                event = self._new_event(ticker, credit_scores)
+            else:
+                try:
+                    with open(self.path, 'ab+') as f:
+                        if fcntl is not None:
+                            fcntl.flock(f, fcntl.LOCK_EX)
+                        try:
+                            # Catch up first, so the id and baseline account for other workers' events
+                            self._sync(f)
+                            new_baseline = ticker not in self._baselines
+                            event = self._new_event(ticker, credit_scores)
+                            if event is not None or new_baseline:
+                                line = event if event is not None else {
+                                    'ticker': ticker,
+                                    'base_score': credit_scores['base_score'],
+                                    'grade': credit_scores['grade'],
+                                }
+                                f.write(json.dumps(line).encode() + b'\n')
+                                f.flush()
+                                self._offset = f.tell()
+                        finally:
+                            if fcntl is not None:
+                                fcntl.flock(f, fcntl.LOCK_UN)
+                except OSError as e:
+                    logger.warning(f"Could not persist score event for {ticker}: {e}")
+                    return None
+            if event is None:
+                return None
+            self._append(event)
+            self._changed.notify_all()
+        logger.info(
+            f"Score event {event['id']}: {ticker} {event['previous_score']} ({event['previous_grade']}) "
+            f"-> {event['base_score']} ({event['grade']})"
+        )
+        return event
+
+    def _new_event(self, ticker: str, credit_scores: dict) -> Optional[dict]:
+        """The event for a score change against the baseline, or None (the first score becomes the baseline)"""
+        score, grade = credit_scores['base_score'], credit_scores['grade']
+        baseline = self._baselines.get(ticker)
+        if baseline is None:
+            self._baselines[ticker] = (score, grade)
+            return None
+        previous_score, previous_grade = baseline
+        if abs(score - previous_score) < self.delta and grade == previous_grade:
+            return None
+        event = {
+            'id': self._next_id,
+            'ticker': ticker,
+            'base_score': score,
+            'grade': grade,
+            'previous_score': previous_score,
+            'previous_grade': previous_grade,
+            'timestamp': time.time(),
+        }
+        return event
+
+    def events_since(self, cursor: int, tickers: Optional[set] = None) -> Tuple[List[dict], int]:
+        """
+        Events with id greater than ``cursor``, optionally only for ``tickers``.
+
+        Returns the events and the cursor to resume from. A cursor ahead of
+        the log (e.g. from before a restart without persistence) is reset.
+        """
+        with self._changed:
+            self._sync()
+            latest = self.cursor
+            if cursor >= latest:
+                return [], latest
+            events = self._events[bisect_right(self._ids, cursor):]
+        if tickers:
+            events = [event for event in events if event['ticker'] in tickers]
+        return events, latest
+
+    def wait(self, cursor: int, timeout: float, tickers: Optional[set] = None) -> Tuple[List[dict], int]:
+        """Like ``events_since``, but block up to ``timeout`` seconds for a matching event."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._changed:
+                remaining = deadline - time.monotonic()
+                if not self._sync() and self.cursor <= cursor and remaining > 0:
+                    # Events from other workers only show up in the file, so look again every SYNC_INTERVAL
+                    self._changed.wait(min(remaining, SYNC_INTERVAL) if self.path else remaining)
+                events, cursor = self.events_since(cursor, tickers)
+            if events or time.monotonic() >= deadline:
+                return events, cursor
@@ -1,6 +1,7 @@
 from typing import Tuple
 from pydantic import BaseModel, Field
 import logging
+from uncertainty import score_bands
 
 logger = logging.getLogger(__name__)
 
@@ -76,14 +77,19 @@ def combined_credit_score(
     weight_altman: float = 0.5,
     weight_ohlson: float = 0.4,
     weight_sentiment: float = 0.1,
+    normalizer=None,
 ) -> Tuple[float, Tuple[float, float]]:
     """
     Combine Altman Z, Ohlson O, and sentiment into a final score.
     The weights should sum close to 1.0.
 
+    An optional ``quantile_sketch.UniverseNormalizer`` replaces the fixed
+    normalization ranges with percentiles in the scored universe.
+
     Returns:
         final_score (float): Credit score out of 100
-        confidence_interval (tuple): Score range (low, high) showing error margin
+        confidence_interval (tuple): Score range (low, high) from a Monte Carlo
+            perturbation of the inputs (see ``uncertainty``)
     """
 
     # Step 1: Compute raw Altman Z and Ohlson O scores
@@ -92,8 +98,11 @@ def combined_credit_score(
     sentiment = fin.sentiment_score  # Already between 0-1
 
     # Step 2: Normalize scores into comparable 0-100 range
-    altman_norm = normalize_score(altman, -5, 8)  # typical range
-    ohlson_norm = 100 - normalize_score(ohlson, -3, 3)  # Invert since lower is better
+    altman_norm = normalizer.normalize_altman(altman) if normalizer is not None else None
+    ohlson_norm = normalizer.normalize_ohlson(ohlson) if normalizer is not None else None
+    if altman_norm is None:
+        altman_norm = normalize_score(altman, -5, 8)  # typical range
+        ohlson_norm = 100 - normalize_score(ohlson, -3, 3)  # Invert since lower is better
     sentiment_norm = sentiment * 100
 
     # Step 3: Weighted combination
@@ -103,9 +112,24 @@ def combined_credit_score(
         + weight_sentiment * sentiment_norm
     )
 
-    # Step 4: Error margins (±5% of score to reflect uncertainty)
-    margin = final_score * 0.05
-    return final_score, (final_score - margin, final_score + margin)
+    # Step 4: Error margins from perturbing every input (all are reported here)
+    inputs = {
+        'total_assets': fin.total_assets, 'total_liabilities': fin.total_liabilities,
+        'current_assets': fin.current_assets, 'current_liabilities': fin.current_liabilities,
+        'working_capital': fin.working_capital,
+        'retained_earnings': fin.retained_earnings, 'ebit': fin.ebit,
+        'market_cap': fin.market_value_equity, 'revenue': fin.sales, 'net_income': fin.net_income,
+    }
+    # Keep the denominators well away from zero (10 standard deviations at the reported sigma)
+    floors = {'current_assets': 0, 'current_liabilities': 0, 'revenue': 0}
+    for field in ('total_assets', 'total_liabilities'):
+        if inputs[field] > 0:
+            floors[field] = inputs[field] / 2
+    low, high = score_bands(
+        inputs, (), sentiment, (weight_altman, weight_ohlson, weight_sentiment), normalizer,
+        altman_bounds=(-5, 8), ohlson_bounds=(-3, 3), floors=floors,
+    )
+    return final_score, (min(low, final_score), max(high, final_score))
 
 
 # ================== Example Usage =====================
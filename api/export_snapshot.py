@@ -0,0 +1,258 @@
+"""
+Columnar snapshot export of a scored ticker universe.
+
+Scores the universe in chunks and streams each chunk to a Parquet or Arrow IPC
+file as one row group / record batch, so memory stays bounded by the chunk size
+rather than the universe size. Each row carries the scores, the score
+components, the grade, the numeric ratios, and where each value came from.
+Ticker, grade and provenance columns are dictionary-encoded.
+
+Usage:
+    python export_snapshot.py --tickers AAPL,MSFT,GOOGL --out snapshot.parquet
+    python export_snapshot.py --tickers-file universe.txt --out snapshot.arrow --format arrow
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from async_fetch import analyze_tickers_async
+from fetch_and_score import (
+    FAILURE_ERROR, FAILURE_NO_DATA, FAILURE_THROTTLED, FAILURE_UNAVAILABLE, get_credit_grade,
+)
+from quantile_sketch import UniverseNormalizer
+from quotes import LISTING_CHECKS_PATH, load_listing_checks, save_listing_checks
+from unstructured import sentiment_backend
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    logger.warning("pyarrow not available. Snapshot export is disabled.")
+    PYARROW_AVAILABLE = False
+
+DEFAULT_ROW_GROUP_SIZE = 500
+
+SCORE_FIELDS = ['base_score', 'score_min', 'score_max', 'altman_z', 'ohlson_o', 'sentiment']
+
+# Column name -> key in compute_ratio_values output
+RATIO_COLUMNS = {
+    'debt_to_equity': 'Debt to Equity',
+    'price_to_earnings': 'Price to Earnings',
+    'current_ratio': 'Current Ratio',
+    'quick_ratio': 'Quick Ratio',
+    'roce': 'ROCE',
+    'roe': 'ROE',
+    'roa': 'ROA',
+}
+
+# All possible grades, in a fixed order so every batch shares one dictionary
+GRADES = [get_credit_grade(score) for score in (90, 80, 70, 60, 50, 40, 0)]
+
+# Dictionary-encoded string columns whose dictionaries grow as the export runs,
+# with their initial values. Arrow IPC treats growing an *empty* dictionary as a
+# replacement, so columns without known values are seeded with ''.
+_GROWING_DICTIONARY_SEEDS = {
+    'ticker': [],
+    'failure_reason': [FAILURE_NO_DATA, FAILURE_THROTTLED, FAILURE_ERROR, FAILURE_UNAVAILABLE],
+    'data_source': ['yfinance'],
+    'sentiment_source': ['keyword', 'finbert', 'finbert-int8', 'finbert-onnx'],
+    **{f'{column}_source': [''] for column in RATIO_COLUMNS},
+}
+
+
+def snapshot_schema() -> "pa.Schema":
+    """Arrow schema of the exported snapshot."""
+    string_dict = pa.dictionary(pa.int32(), pa.string())
+    fields = [
+        pa.field('ticker', string_dict, nullable=False),
+        pa.field('company_name', pa.string()),
+        pa.field('scored', pa.bool_(), nullable=False),
+        pa.field('failure_reason', string_dict),
+        pa.field('grade', pa.dictionary(pa.int8(), pa.string())),
+    ]
+    fields += [pa.field(name, pa.float64()) for name in SCORE_FIELDS]
+    fields += [pa.field(column, pa.float64()) for column in RATIO_COLUMNS]
+    fields += [pa.field(f'{column}_source', string_dict) for column in RATIO_COLUMNS]
+    fields += [
+        pa.field('data_source', string_dict),
+        pa.field('sentiment_source', string_dict),
+        pa.field('scored_at', pa.timestamp('us', tz='UTC'), nullable=False),
+    ]
+    return pa.schema(fields)
+
+
+class _GrowingDictionary:
+    """
+    Encodes strings against a dictionary that only ever grows.
+
+    Arrow IPC files cannot replace a dictionary between batches, but they can
+    extend it, so each batch's dictionary must start with the previous one.
+    """
+
+    def __init__(self, seed: List[str]):
+        self._values: List[str] = list(seed)
+        self._index: Dict[str, int] = {value: i for i, value in enumerate(self._values)}
+
+    def encode(self, values: List[Optional[str]]) -> "pa.DictionaryArray":
+        indices = []
+        for value in values:
+            if value is None:
+                indices.append(None)
+                continue
+            if value not in self._index:
+                self._index[value] = len(self._values)
+                self._values.append(value)
+            indices.append(self._index[value])
+        return pa.DictionaryArray.from_arrays(
+            pa.array(indices, pa.int32()), pa.array(self._values, pa.string())
+        )
+
+
+def _chunks(tickers: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for ticker in tickers:
+        chunk.append(ticker)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _snapshot_rows(chunk: List[str], normalizer: Optional[UniverseNormalizer] = None) -> List[dict]:
+    failures: Dict[str, str] = {}
+    analyses = asyncio.run(
+        analyze_tickers_async(chunk, failures=failures, numeric_ratios=True, normalizer=normalizer)
+    )
+    scored_at = datetime.now(timezone.utc)
+    sentiment_source = sentiment_backend()
+
+    rows = []
+    for ticker in chunk:
+        analysis = analyses.get(ticker)
+        row = {'ticker': ticker, 'scored': analysis is not None, 'scored_at': scored_at}
+        if analysis is None:
+            row['failure_reason'] = failures.get(ticker, FAILURE_ERROR)
+        else:
+            scores = analysis['credit_scores']
+            ratios = analysis['financial_ratios']
+            sources = analysis['ratio_sources']
+            row.update({name: scores[name] for name in SCORE_FIELDS})
+            row['grade'] = scores['grade']
+            row['company_name'] = analysis['company_name']
+            for column, ratio in RATIO_COLUMNS.items():
+                row[column] = ratios.get(ratio)
+                row[f'{column}_source'] = sources.get(ratio)
+            row['data_source'] = 'yfinance'
+            row['sentiment_source'] = sentiment_source
+        rows.append(row)
+    return rows
+
+
+def _record_batch(rows: List[dict], schema, dictionaries: Dict[str, _GrowingDictionary]) -> "pa.RecordBatch":
+    grade_dictionary = pa.array(GRADES, pa.string())
+    grade_index = {grade: i for i, grade in enumerate(GRADES)}
+
+    arrays = []
+    for field in schema:
+        values = [row.get(field.name) for row in rows]
+        if field.name in dictionaries:
+            arrays.append(dictionaries[field.name].encode(values))
+        elif field.name == 'grade':
+            indices = pa.array([grade_index.get(v) for v in values], pa.int8())
+            arrays.append(pa.DictionaryArray.from_arrays(indices, grade_dictionary))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_snapshot(
+    tickers: Iterable[str],
+    path: str,
+    file_format: str = 'parquet',
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    sketch_in: Optional[str] = None,
+) -> int:
+    """
+    Score ``tickers`` and stream the results to ``path``.
+
+    Args:
+        tickers: Ticker symbols; may be a lazy iterable.
+        path: Output file.
+        file_format: 'parquet' or 'arrow' (Arrow IPC file, mmap-able).
+        row_group_size: Tickers scored and written per row group / batch.
+        sketch_in: Universe sketch to normalize scores against (fixed bounds if omitted).
+
+    Returns:
+        int: Number of rows written.
+    """
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow is required for snapshot export")
+    if file_format not in ('parquet', 'arrow'):
+        raise ValueError(f"Unsupported format: {file_format}")
+
+    normalizer = UniverseNormalizer.load(sketch_in, learn=False) if sketch_in else None
+    schema = snapshot_schema()
+    dictionaries = {name: _GrowingDictionary(seed) for name, seed in _GROWING_DICTIONARY_SEEDS.items()}
+    if file_format == 'parquet':
+        writer = pq.ParquetWriter(path, schema, compression='zstd', use_dictionary=True)
+    else:
+        sink = pa.OSFile(path, 'wb')
+        writer = pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+    written = 0
+    try:
+        for chunk in _chunks((t.strip().upper() for t in tickers if t.strip()), row_group_size):
+            rows = _snapshot_rows(chunk, normalizer)
+            writer.write_batch(_record_batch(rows, schema, dictionaries))
+            written += len(rows)
+            logger.info(f"Wrote {written} rows to {path}")
+    finally:
+        writer.close()
+        if file_format == 'arrow':
+            sink.close()
+    return written
+
+
+def _read_tickers(args) -> Iterator[str]:
+    if args.tickers:
+        yield from args.tickers.split(',')
+    if args.tickers_file:
+        with open(args.tickers_file) as f:
+            for line in f:
+                yield line
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Score a ticker universe and export a columnar snapshot.")
+    parser.add_argument('--tickers', help="Comma-separated ticker symbols")
+    parser.add_argument('--tickers-file', help="File with one ticker per line")
+    parser.add_argument('--out', required=True, help="Output file path")
+    parser.add_argument('--format', choices=['parquet', 'arrow'], default=None,
+                        help="Output format (default: inferred from --out, else parquet)")
+    parser.add_argument('--row-group-size', type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    parser.add_argument('--sketch-in', help="Universe sketch to normalize scores against")
+    parser.add_argument('--listing-checks', default=LISTING_CHECKS_PATH,
+                        help="Listing checks file to reuse and update (default: $LISTING_CHECKS_PATH)")
+    args = parser.parse_args(argv)
+
+    if not args.tickers and not args.tickers_file:
+        parser.error("one of --tickers or --tickers-file is required")
+    file_format = args.format or ('arrow' if args.out.endswith(('.arrow', '.feather')) else 'parquet')
+
+    logging.basicConfig(level=logging.INFO)
+    if args.listing_checks:
+        load_listing_checks(args.listing_checks)
+    rows = export_snapshot(_read_tickers(args), args.out, file_format, args.row_group_size, args.sketch_in)
+    if args.listing_checks:
+        save_listing_checks(args.listing_checks)
+    print(f"Exported {rows} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
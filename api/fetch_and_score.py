@@ -1,170 +1,299 @@
-import yfinance as yf
-import pandas as pd
-import numpy as np
-from typing import List, Dict
+from __future__ import annotations
+from typing import List, Dict, Optional, Tuple
 import logging
-from credtech import altman_z_score, ohlson_o_score, normalize_score, CompanyFinancials
+from lazy_imports import lazy_import
 from unstructured import news_sentiment_score
+from rate_limit import RetryBudget, UpstreamThrottled
+from resilience import CircuitOpenError, is_outage
+from statements import CompactStatement, as_statement, fetch_statement
 from datetime import datetime
+from quantile_sketch import UniverseNormalizer
+from quotes import LazyInfo, fetch_quotes, market_cap as quote_market_cap, statement_values_usable
+
+# Heavy dependencies are imported on first use to keep API start-up fast
+yf = lazy_import("yfinance")
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+credtech = lazy_import("credtech")
+uncertainty = lazy_import("uncertainty")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Failure reasons reported through the ``failures`` argument
+FAILURE_NO_DATA = 'no_data'
+FAILURE_THROTTLED = 'throttled'
+FAILURE_ERROR = 'error'
+FAILURE_UNAVAILABLE = 'unavailable'  # upstream down (connection error, timeout or open circuit)
+
+def fetch_financial_statements(
+    ticker: str,
+    stock=None,
+    budget: Optional[RetryBudget] = None
+) -> Tuple[CompactStatement, CompactStatement, LazyInfo]:
+    """
+    Download the quarterly balance sheet and income statement for a ticker.
+    The statements are reduced to the line items the model reads (see
+    ``statements``); info is only downloaded if something reads it.
+
+    Raises UpstreamThrottled if yfinance kept throttling us.
+    """
+    info = LazyInfo(ticker, budget, stock)
+    stock = stock if stock is not None else yf.Ticker(ticker)
+    return (
+        fetch_statement(stock, 'quarterly_balance_sheet', budget),
+        fetch_statement(stock, 'quarterly_financials', budget),
+        info,
+    )
+
+
+def score_financials(
+    ticker: str,
+    quarterly_bs: CompactStatement,
+    quarterly_income: CompactStatement,
+    info: dict,
+    sentiment_score: float,
+    weight_altman: float = 0.50,
+    weight_ohlson: float = 0.40,
+    weight_sentiment: float = 0.10,
+    normalizer: Optional[UniverseNormalizer] = None,
+    quote: Optional[dict] = None
+) -> Optional[Dict[str, float]]:
+    """
+    Compute the credit score for one ticker from already-fetched statements.
+
+    With a ``normalizer``, Altman and Ohlson are mapped to their percentile in
+    the scored universe instead of fixed bounds (until the universe is large
+    enough), and this ticker is added to the universe.
+
+    Market cap is the ``quote`` price (see ``quotes.fetch_quotes``) times the
+    latest reported share count when the listing allows it (see
+    ``quotes.statement_values_usable``), else ``info['marketCap']``.
+
+    ``score_min``/``score_max`` are a Monte Carlo band over the inputs (see
+    ``uncertainty``), wider when fields had to be defaulted.
+
+    Raw yfinance DataFrames are accepted too. Returns None when the
+    statements are empty.
+    """
+    quarterly_bs = as_statement(quarterly_bs)
+    quarterly_income = as_statement(quarterly_income)
+    if quarterly_bs.empty or quarterly_income.empty:
+        logger.warning(f"No financial data available for {ticker}")
+        return None
+
+    def safe_extract(statement, keys, default=np.nan):
+        for key in keys:
+            value = statement.latest(key)
+            if value is not None and not np.isnan(value):
+                return value
+        return default
+
+    # Extract financial data
+    total_assets = safe_extract(quarterly_bs, [
+        'Total Assets', 'TotalAssets', 'Assets'
+    ])
+    
+    total_liabilities = safe_extract(quarterly_bs, [
+        'Total Liab', 'Total Liabilities', 'TotalLiabilities'
+    ])
+    if pd.isna(total_liabilities):
+        total_equity = safe_extract(quarterly_bs, [
+            'Total Stockholder Equity', 'Stockholders Equity', 'Total Equity', 'Shareholders Equity'
+        ])
+        if not pd.isna(total_equity) and not pd.isna(total_assets):
+            total_liabilities = total_assets - total_equity
+            logger.info(f"{ticker}: Estimated total_liabilities as total_assets - total_equity")
+
+    current_assets = safe_extract(quarterly_bs, [
+        'Total Current Assets', 'TotalCurrentAssets', 'Current Assets'
+    ])
+    
+    current_liabilities = safe_extract(quarterly_bs, [
+        'Total Current Liabilities', 'TotalCurrentLiabilities', 'Current Liabilities'
+    ])
+    
+    retained_earnings = safe_extract(quarterly_bs, [
+        'Retained Earnings', 'RetainedEarnings'
+    ])
+    
+    revenue = safe_extract(quarterly_income, [
+        'Total Revenue', 'TotalRevenue', 'Revenue', 'Net Sales'
+    ])
+    
+    net_income = safe_extract(quarterly_income, [
+        'Net Income', 'NetIncome'
+    ])
+    
+    ebit = safe_extract(quarterly_income, [
+        'EBIT', 'Ebit', 'Operating Income', 'OperatingIncome'
+    ])
+    
+    market_cap = None
+    if quote and statement_values_usable(ticker, info):
+        market_cap = quote_market_cap(quote.get('price'), quarterly_bs)
+    if market_cap is None:
+        market_cap = info.get('marketCap')
+
+    # Apply defaults and estimates for missing values
+    imputed = []
+
+    def apply_default(value, default, field_name):
+        if pd.isna(value) or value is None:
+            logger.warning(f"{ticker}: Using default for {field_name}: {default}")
+            imputed.append(field_name)
+            return default
+        return float(value)
+    
+    total_assets = max(apply_default(total_assets, 1000000, "total_assets"), 1000000)
+    total_liabilities = max(apply_default(total_liabilities, 100000, "total_liabilities"), 100000)
+    current_assets = max(apply_default(current_assets, total_assets * 0.4, "current_assets"), 0)
+    current_liabilities = max(apply_default(current_liabilities, total_liabilities * 0.6, "current_liabilities"), 0)
+    retained_earnings = apply_default(retained_earnings, total_assets - total_liabilities, "retained_earnings")
+    ebit = apply_default(ebit, 0, "ebit")
+    market_cap = max(apply_default(market_cap, 1000000, "market_cap"), 1000000)
+    revenue = max(apply_default(revenue, 0, "revenue"), 0)
+    net_income = apply_default(net_income, 0, "net_income")
+    
+    working_capital = current_assets - current_liabilities
+
+    # Create financial object
+    fin = credtech.CompanyFinancials(
+        total_assets=total_assets,
+        total_liabilities=total_liabilities,
+        working_capital=working_capital,
+        retained_earnings=retained_earnings,
+        ebit=ebit,
+        market_value_equity=market_cap,
+        sales=revenue,
+        net_income=net_income,
+        current_assets=current_assets,
+        current_liabilities=current_liabilities,
+        sentiment_score=sentiment_score
+    )
+
+    # Calculate scores
+    altman_raw = credtech.altman_z_score(fin)
+    ohlson_raw = credtech.ohlson_o_score(fin)
+    
+    # Normalize scores
+    altman_norm = ohlson_norm = None
+    if normalizer is not None:
+        altman_norm = normalizer.normalize_altman(altman_raw)
+        ohlson_norm = normalizer.normalize_ohlson(ohlson_raw)
+    if altman_norm is None:
+        altman_norm = credtech.normalize_score(altman_raw, *uncertainty.ALTMAN_BOUNDS)
+        ohlson_norm = 100 - credtech.normalize_score(ohlson_raw, *uncertainty.OHLSON_BOUNDS)  # Invert since lower is better
+
+    final_score = (
+        weight_altman * altman_norm
+        + weight_ohlson * ohlson_norm
+        + weight_sentiment * sentiment_score * 100
+    )
+    
+    # Confidence interval from perturbed inputs, against the universe as it was before this ticker
+    inputs = {
+        'total_assets': total_assets, 'total_liabilities': total_liabilities,
+        'current_assets': current_assets, 'current_liabilities': current_liabilities,
+        'retained_earnings': retained_earnings, 'ebit': ebit, 'market_cap': market_cap,
+        'revenue': revenue, 'net_income': net_income,
+    }
+    score_min, score_max = uncertainty.score_bands(
+        inputs, imputed, sentiment_score, (weight_altman, weight_ohlson, weight_sentiment), normalizer
+    )
+    # The point estimate can fall outside a skewed band; keep it inside for display
+    score_min, score_max = min(score_min, final_score), max(score_max, final_score)
+
+    if normalizer is not None and normalizer.learn:
+        normalizer.update(altman_raw, ohlson_raw)
+
+    logger.info(f"{ticker}: Score = {final_score:.2f}")
+
+    return {
+        'base_score': round(final_score, 2),
+        'score_min': round(score_min, 2),
+        'score_max': round(score_max, 2),
+        'altman_z': round(altman_raw, 2),
+        'ohlson_o': round(ohlson_raw, 2),
+        'sentiment': round(sentiment_score, 3),
+        'grade': get_credit_grade(final_score)
+    }
+
+
 def fetch_and_compute_credit_scores(
     tickers: List[str], 
     weight_altman: float = 0.50,
     weight_ohlson: float = 0.40,
-    weight_sentiment: float = 0.10
+    weight_sentiment: float = 0.10,
+    failures: Optional[Dict[str, str]] = None,
+    retry_budget: Optional[RetryBudget] = None,
+    normalizer: Optional[UniverseNormalizer] = None,
+    quotes: Optional[Dict[str, dict]] = None
 ) -> Dict[str, Dict[str, float]]:
+    """
+    Score each ticker. Tickers that could not be scored are recorded in
+    ``failures`` (if given) with one of the FAILURE_* reasons.
+
+    Tickers that hit upstream throttling are deferred and retried once at the
+    end of the run, drawing on a retry budget shared by the whole job.
+
+    ``normalizer`` is passed on to ``score_financials``. Prices for all
+    tickers are fetched in one batch unless ``quotes`` are given.
+    """
     results = {}
-    failed_tickers = []
-    
-    for ticker in tickers:
+    failures = failures if failures is not None else {}
+    budget = retry_budget if retry_budget is not None else RetryBudget.for_job(len(tickers))
+    quotes = quotes if quotes is not None else fetch_quotes(tickers, budget)
+
+    def process(ticker: str) -> Optional[str]:
         logger.info(f"Processing ticker: {ticker}")
         try:
-            stock = yf.Ticker(ticker)
-            quarterly_bs = stock.quarterly_balance_sheet
-            quarterly_income = stock.quarterly_financials
-            info = stock.info
+            quarterly_bs, quarterly_income, info = fetch_financial_statements(ticker, budget=budget)
 
             if quarterly_bs.empty or quarterly_income.empty:
                 logger.warning(f"No financial data available for {ticker}")
-                failed_tickers.append(ticker)
-                continue
-
-            bs_latest = quarterly_bs.iloc[:, 0]
-            is_latest = quarterly_income.iloc[:, 0]
-
-            def safe_extract(series, keys, default=np.nan):
-                for key in keys:
-                    try:
-                        value = series.get(key)
-                        if value is not None and not pd.isna(value):
-                            return float(value)
-                    except:
-                        continue
-                return default
-
-            # Extract financial data
-            total_assets = safe_extract(bs_latest, [
-                'Total Assets', 'TotalAssets', 'Assets'
-            ])
-            
-            total_liabilities = safe_extract(bs_latest, [
-                'Total Liab', 'Total Liabilities', 'TotalLiabilities'
-            ])
-            if pd.isna(total_liabilities):
-                total_equity = safe_extract(bs_latest, [
-                    'Total Stockholder Equity', 'Stockholders Equity', 'Total Equity', 'Shareholders Equity'
-                ])
-                if not pd.isna(total_equity) and not pd.isna(total_assets):
-                    total_liabilities = total_assets - total_equity
-                    logger.info(f"{ticker}: Estimated total_liabilities as total_assets - total_equity")
-
-            current_assets = safe_extract(bs_latest, [
-                'Total Current Assets', 'TotalCurrentAssets', 'Current Assets'
-            ])
-            
-            current_liabilities = safe_extract(bs_latest, [
-                'Total Current Liabilities', 'TotalCurrentLiabilities', 'Current Liabilities'
-            ])
-            
-            retained_earnings = safe_extract(bs_latest, [
-                'Retained Earnings', 'RetainedEarnings'
-            ])
-            
-            revenue = safe_extract(is_latest, [
-                'Total Revenue', 'TotalRevenue', 'Revenue', 'Net Sales'
-            ])
-            
-            net_income = safe_extract(is_latest, [
-                'Net Income', 'NetIncome'
-            ])
-            
-            ebit = safe_extract(is_latest, [
-                'EBIT', 'Ebit', 'Operating Income', 'OperatingIncome'
-            ])
-            
-            market_cap = info.get('marketCap')
-
-            # Apply defaults and estimates for missing values
-            def apply_default(value, default, field_name):
-                if pd.isna(value) or value is None:
-                    logger.warning(f"{ticker}: Using default for {field_name}: {default}")
-                    return default
-                return float(value)
-            
-            total_assets = max(apply_default(total_assets, 1000000, "total_assets"), 1000000)
-            total_liabilities = max(apply_default(total_liabilities, 100000, "total_liabilities"), 100000)
-            current_assets = max(apply_default(current_assets, total_assets * 0.4, "current_assets"), 0)
-            current_liabilities = max(apply_default(current_liabilities, total_liabilities * 0.6, "current_liabilities"), 0)
-            retained_earnings = apply_default(retained_earnings, total_assets - total_liabilities, "retained_earnings")
-            ebit = apply_default(ebit, 0, "ebit")
-            market_cap = max(apply_default(market_cap, 1000000, "market_cap"), 1000000)
-            revenue = max(apply_default(revenue, 0, "revenue"), 0)
-            net_income = apply_default(net_income, 0, "net_income")
-            
-            working_capital = current_assets - current_liabilities
+                return FAILURE_NO_DATA
 
             # Get sentiment score
             try:
-                sentiment_score = news_sentiment_score(ticker)
+                sentiment_score = news_sentiment_score(ticker, budget=budget)
             except Exception as e:
                 logger.warning(f"Could not get sentiment for {ticker}: {e}")
                 sentiment_score = 0.5  # Neutral default
 
-            # Create financial object
-            fin = CompanyFinancials(
-                total_assets=total_assets,
-                total_liabilities=total_liabilities,
-                working_capital=working_capital,
-                retained_earnings=retained_earnings,
-                ebit=ebit,
-                market_value_equity=market_cap,
-                sales=revenue,
-                net_income=net_income,
-                current_assets=current_assets,
-                current_liabilities=current_liabilities,
-                sentiment_score=sentiment_score
+            results[ticker] = score_financials(
+                ticker, quarterly_bs, quarterly_income, info, sentiment_score,
+                weight_altman, weight_ohlson, weight_sentiment, normalizer, quotes.get(ticker)
             )
+            return None
 
-            # Calculate scores
-            altman_raw = altman_z_score(fin)
-            ohlson_raw = ohlson_o_score(fin)
-            
-            # Normalize scores
-            altman_norm = normalize_score(altman_raw, -3, 10)
-            ohlson_norm = 100 - normalize_score(ohlson_raw, -5, 4)  # Invert since lower is better
-
-            final_score = (
-                weight_altman * altman_norm
-                + weight_ohlson * ohlson_norm
-                + weight_sentiment * sentiment_score * 100
-            )
-            
-            # Calculate confidence interval
-            margin = final_score * 0.05
-            score_min = max(0, final_score - margin)
-            score_max = min(100, final_score + margin)
-
-            results[ticker] = {
-                'base_score': round(final_score, 2),
-                'score_min': round(score_min, 2),
-                'score_max': round(score_max, 2),
-                'altman_z': round(altman_raw, 2),
-                'ohlson_o': round(ohlson_raw, 2),
-                'sentiment': round(sentiment_score, 3),
-                'grade': get_credit_grade(final_score)
-            }
-            
-            logger.info(f"{ticker}: Score = {final_score:.2f}")
-            
+        except UpstreamThrottled as e:
+            logger.warning(f"Deferring {ticker}: {str(e)}")
+            return FAILURE_THROTTLED
+        except CircuitOpenError as e:
+            logger.warning(f"Skipping {ticker}: {str(e)}")
+            return FAILURE_UNAVAILABLE
         except Exception as e:
             logger.error(f"Failed to process {ticker}: {str(e)}")
-            failed_tickers.append(ticker)
+            return FAILURE_UNAVAILABLE if is_outage(e, False) else FAILURE_ERROR
+
+    deferred = []
+    for ticker in tickers:
+        reason = process(ticker)
+        if reason == FAILURE_THROTTLED:
+            deferred.append(ticker)
+        elif reason is not None:
+            failures[ticker] = reason
+
+    if deferred:
+        logger.info(f"Retrying {len(deferred)} throttled tickers")
+        for ticker in deferred:
+            reason = process(ticker)
+            if reason is not None:
+                failures[ticker] = reason
 
-    if failed_tickers:
-        logger.warning(f"Failed tickers: {failed_tickers}")
+    if failures:
+        logger.warning(f"Failed tickers: {failures}")
     
     logger.info(f"Processed {len(results)} of {len(tickers)}")
     return results
@@ -1,5 +1,8 @@
-import yfinance as yf
 import logging
+from lazy_imports import lazy_import
+from rate_limit import yf_attr
+
+yf = lazy_import("yfinance")
 
 logger = logging.getLogger(__name__)
 
@@ -15,22 +18,33 @@ def get_company_name_yfinance(ticker):
     """
     try:
         stock = yf.Ticker(ticker)
-        info = stock.info
-        
-        if not info:
-            return f"No information available for {ticker}"
-            
-        company_name = info.get('longName') or info.get('shortName') or info.get('name')
-        
-        if company_name:
-            return company_name
-        else:
-            return f"Company name not available for {ticker}"
+        return company_name_from_info(ticker, yf_attr(stock, "info"))
             
     except Exception as e:
         logger.error(f"Error fetching data for {ticker}: {str(e)}")
         return f"Error fetching data for {ticker}: {str(e)}"
 
+def company_name_from_info(ticker, info):
+    """
+    Picks the company name out of an already-fetched yfinance info dict.
+    
+    Args:
+        ticker (str): Stock ticker symbol.
+        info (dict): yfinance ``Ticker.info`` payload.
+        
+    Returns:
+        str: Company name, or an error message if not found.
+    """
+    if not info:
+        return f"No information available for {ticker}"
+        
+    company_name = info.get('longName') or info.get('shortName') or info.get('name')
+    
+    if company_name:
+        return company_name
+    else:
+        return f"Company name not available for {ticker}"
+
 # Example usage and test
 if __name__ == "__main__":
     test_tickers = ["AAPL", "MSFT", "GOOGL", "INVALID"]
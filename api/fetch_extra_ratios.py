@@ -1,9 +1,15 @@
-import yfinance as yf
-import pandas as pd
-import numpy as np
+from __future__ import annotations
 import logging
-import re
 from typing import Dict, List, Optional, Tuple
+from lazy_imports import lazy_import
+from rate_limit import RetryBudget
+from statements import CompactStatement, as_statement, fetch_statement, normalize_label
+from quotes import LazyInfo, statement_values_usable, trailing_eps as statement_trailing_eps
+
+# Imported on first use to keep API start-up fast
+yf = lazy_import("yfinance")
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
 
 # ---------------------------
 # Logging — very chatty on purpose
@@ -15,70 +21,52 @@ logging.basicConfig(
 )
 log = logging.getLogger("ratios")
 
+# Ratios produced by compute_ratio_values, in output order
+RATIO_NAMES = [
+    "Debt to Equity",
+    "Price to Earnings",
+    "Current Ratio",
+    "Quick Ratio",
+    "ROCE",
+    "ROE",
+    "ROA",
+]
+
 # ---------------------------
 # Helpers
 # ---------------------------
-def _normalize(s: str) -> str:
-    """Normalize a line-item name for matching (case/space/punct insensitive)."""
-    if s is None:
-        return ""
-    return re.sub(r"[^a-z0-9]", "", str(s).lower())
-
-def _latest_col(df: pd.DataFrame) -> Optional[pd.Timestamp]:
-    if df is None or df.empty:
-        return None
-    cols = list(df.columns)
-    # Try datetimes; if fail, assume first column is most recent (yfinance typical)
-    try:
-        dts = pd.to_datetime(cols, errors="coerce")
-        # pick the max valid date
-        if dts.notna().any():
-            mx_idx = int(np.nanargmax(dts.values))
-            return cols[mx_idx]
-    except Exception:
-        pass
-    return cols[0]
-
 def _find_item_value(
-    df: Optional[pd.DataFrame],
+    stmt: Optional[CompactStatement],
     candidates: List[str],
 ) -> Tuple[Optional[float], Optional[str]]:
-    """Search df’s index for any candidate key (robust, fuzzy). Return (value, matched_key)."""
-    if df is None or df.empty:
+    """Search the statement's line items for any candidate key (robust, fuzzy). Return (value, matched_key)."""
+    if stmt is None or stmt.empty:
         return None, None
 
-    # map normalized index -> real index
-    idx_map = {_normalize(idx): idx for idx in df.index}
+    # map normalized label -> real label
+    idx_map = {normalize_label(label): label for label in stmt.labels}
     # Try exact normalized matches first
     for key in candidates:
-        nk = _normalize(key)
+        nk = normalize_label(key)
         if nk in idx_map:
-            col = _latest_col(df)
-            if col is not None and col in df.columns:
-                try:
-                    val = df.loc[idx_map[nk], col]
-                    return float(val), idx_map[nk]
-                except Exception:
-                    pass
+            return stmt.latest(idx_map[nk]), idx_map[nk]
 
     # Fallback: substring search
     for key in candidates:
-        nk = _normalize(key)
+        nk = normalize_label(key)
         hits = [real for norm, real in idx_map.items() if nk in norm]
         if hits:
-            col = _latest_col(df)
-            if col is not None and col in df.columns:
-                for real in hits:
-                    try:
-                        val = df.loc[real, col]
-                        return float(val), real
-                    except Exception:
-                        continue
+            return stmt.latest(hits[0]), hits[0]
     return None, None
 
-def _choose(value_list: List[Tuple[Optional[float], str]]) -> Tuple[Optional[float], Optional[str]]:
-    """Return the first non-None (value, src)."""
+def _choose(value_list: List[Tuple[object, str]]) -> Tuple[Optional[float], Optional[str]]:
+    """
+    Return the first non-None (value, src). A value may be a callable, which is
+    only evaluated if every earlier candidate was missing (used for info lookups).
+    """
     for v, s in value_list:
+        if callable(v):
+            v = v()
         if v is not None and (isinstance(v, (int, float)) and not np.isnan(v)):
             return float(v), s
     return None, None
@@ -89,53 +77,120 @@ def _pretty(num: Optional[float]) -> str:
     # Format compactly; ratios like ROE/ROA/ROCE are in decimals
     return f"{num:.6f}"
 
-def _series_two(df: Optional[pd.DataFrame], candidates: List[str]) -> Optional[pd.Series]:
-    """Extract the latest values for a given set of keys from a dataframe as a pandas Series."""
-    if df is None or df.empty:
+def _finite(num: Optional[float]) -> Optional[float]:
+    """Map NaN/inf to None so callers only ever see real numbers or None."""
+    if num is None or (isinstance(num, float) and (np.isnan(num) or np.isinf(num))):
+        return None
+    return float(num)
+
+def _series_two(stmt: Optional[CompactStatement], candidates: List[str]) -> Optional[Dict[str, float]]:
+    """Extract the reported values ({period: value}) of the first matching key."""
+    if stmt is None or stmt.empty:
         return None
 
-    idx_map = {_normalize(idx): idx for idx in df.index}
+    idx_map = {normalize_label(label): label for label in stmt.labels}
     for key in candidates:
-        nk = _normalize(key)
+        nk = normalize_label(key)
         if nk in idx_map:
-            try:
-                # Return the latest values from the found row as a Series
-                return df.loc[idx_map[nk]].dropna().astype(float)
-            except Exception:
-                pass
+            return stmt.reported(idx_map[nk])
     return None
 
 
 # ---------------------------
 # Main computation
 # ---------------------------
-def fetch_ratios_no_nans(ticker_symbol: str) -> Dict[str, str]:
+def fetch_ratio_inputs(
+    ticker_symbol: str, tkr=None, budget: Optional[RetryBudget] = None, quote: Optional[dict] = None
+) -> Dict[str, object]:
+    """
+    Download the statements and quote data that compute_ratios needs.
+    Statements are reduced to the canonical line items as they arrive; info
+    and fast_info are only downloaded if the computation reads them.
+    """
     log.info("Fetching data for %s", ticker_symbol)
-    tkr = yf.Ticker(ticker_symbol)
+    tkr = tkr if tkr is not None else yf.Ticker(ticker_symbol)
 
-    # Pull statements
+    # Pull statements (through the shared yfinance rate limiter)
     try:
-        bal_yr = tkr.balance_sheet
-        bal_q = tkr.quarterly_balance_sheet
-        inc_yr = tkr.financials          # annual income statement
-        inc_q = tkr.quarterly_financials # quarterly income statement
-        info = tkr.info or {}
-        fast = getattr(tkr, "fast_info", {}) or {}
+        return {
+            "bal_yr": fetch_statement(tkr, "balance_sheet", budget),
+            "bal_q": fetch_statement(tkr, "quarterly_balance_sheet", budget),
+            "inc_yr": fetch_statement(tkr, "financials", budget),          # annual income statement
+            "inc_q": fetch_statement(tkr, "quarterly_financials", budget), # quarterly income statement
+            "info": LazyInfo(ticker_symbol, budget, tkr),
+            "fast": getattr(tkr, "fast_info", {}) or {},
+            "quote": quote,
+        }
     except Exception as e:
         log.error("Failed to fetch statements: %s", e)
         raise
 
+
+def fetch_ratios_no_nans(ticker_symbol: str, quotes: Optional[Dict[str, dict]] = None) -> Dict[str, str]:
+    quote = (quotes or {}).get(ticker_symbol)
+    return compute_ratios(ticker_symbol, **fetch_ratio_inputs(ticker_symbol, quote=quote))
+
+
+def compute_ratios(ticker_symbol: str, **inputs) -> Dict[str, str]:
+    """Compute the display ratios (strings, "N/A" for missing) from fetch_ratio_inputs output."""
+    values, _ = compute_ratio_values(ticker_symbol, **inputs)
+    result = format_ratios(values)
+
+    # Helpful recap in logs
+    log.info("Computed ratios for %s => %s", ticker_symbol, result)
+    return result
+
+
+def format_ratios(values: Dict[str, Optional[float]]) -> Dict[str, str]:
+    """Format numeric ratios the way the API returns them ("N/A" for missing)."""
+    return {name: _pretty(value) for name, value in values.items()}
+
+
+def compute_ratio_values(
+    ticker_symbol: str,
+    bal_yr: Optional[CompactStatement],
+    bal_q: Optional[CompactStatement],
+    inc_yr: Optional[CompactStatement],
+    inc_q: Optional[CompactStatement],
+    info: dict,
+    fast,
+    quote: Optional[dict] = None,
+) -> Tuple[Dict[str, Optional[float]], Dict[str, Optional[str]]]:
+    """
+    Compute the ratios from already-fetched statements (compact, or raw
+    yfinance DataFrames).
+
+    Returns (values, sources): numeric ratios (None when unavailable) and, per
+    ratio, a short description of which line items it was derived from.
+    """
+    bal_yr, bal_q, inc_yr, inc_q = (as_statement(s) for s in (bal_yr, bal_q, inc_yr, inc_q))
+
     # --- Price/Earnings (trailing) ---
-    # Preferred: info['trailingPE']; else compute from price / trailingEps
-    trailing_pe = info.get("trailingPE")
-    trailing_eps = info.get("trailingEps")
-    price_sources = [fast.get("last_price"), fast.get("last_price_raw"), info.get("currentPrice")]
-    price = next((p for p in price_sources if isinstance(p, (int, float)) and p is not None), None)
-    if trailing_pe is None and (price is not None and trailing_eps not in (None, 0)):
-        trailing_pe = price / trailing_eps if trailing_eps not in (None, 0) else None
-        log.debug("Computed trailing P/E via price/eps: price=%s eps=%s -> pe=%s", price, trailing_eps, trailing_pe)
+    # Preferred: quote price / diluted EPS of the last four quarters, when the
+    # statements are in the quote currency; else info['trailingPE']; else
+    # price / info['trailingEps']. Not meaningful (None) for losses.
+    price_sources = [
+        lambda: (quote or {}).get("price"),
+        lambda: fast.get("last_price"),
+        lambda: fast.get("last_price_raw"),
+        lambda: info.get("currentPrice"),
+    ]
+    price = next((p for p in (source() for source in price_sources) if isinstance(p, (int, float))), None)
+    statement_eps = None
+    if price is not None and statement_values_usable(ticker_symbol, info):
+        statement_eps = statement_trailing_eps(inc_q)
+    if statement_eps is not None:
+        trailing_eps = statement_eps
+        trailing_pe = price / statement_eps if statement_eps > 0 else None
+        pe_src = "price / quarterly Diluted EPS (4q)" if trailing_pe is not None else None
     else:
-        log.debug("Using info['trailingPE']=%s (price=%s, eps=%s)", trailing_pe, price, trailing_eps)
+        trailing_pe = info.get("trailingPE")
+        trailing_eps = info.get("trailingEps")
+        pe_src = "info.trailingPE" if trailing_pe is not None else None
+        if trailing_pe is None and price is not None and isinstance(trailing_eps, (int, float)) and trailing_eps > 0:
+            trailing_pe = price / trailing_eps
+            pe_src = "price / info.trailingEps"
+    log.debug("Trailing P/E=%s via %s (price=%s, eps=%s)", trailing_pe, pe_src, price, trailing_eps)
 
     # --- Balance sheet items ---
     # Equity
@@ -148,7 +203,7 @@ def fetch_ratios_no_nans(ticker_symbol: str) -> Dict[str, str]:
     equity_val, equity_key = _choose([
         (*_find_item_value(bal_yr, equity_candidates),),  # type: ignore
         (*_find_item_value(bal_q, equity_candidates),),   # type: ignore
-        (info.get("totalStockholderEquity"), "info.totalStockholderEquity"),
+        (lambda: info.get("totalStockholderEquity"), "info.totalStockholderEquity"),
     ])
     log.debug("Equity found: %s via %s", equity_val, equity_key)
 
@@ -157,7 +212,7 @@ def fetch_ratios_no_nans(ticker_symbol: str) -> Dict[str, str]:
     assets_val, assets_key = _choose([
         (*_find_item_value(bal_yr, assets_candidates),),
         (*_find_item_value(bal_q, assets_candidates),),
-        (info.get("totalAssets"), "info.totalAssets"),
+        (lambda: info.get("totalAssets"), "info.totalAssets"),
     ])
     log.debug("Total Assets found: %s via %s", assets_val, assets_key)
 
@@ -167,14 +222,14 @@ def fetch_ratios_no_nans(ticker_symbol: str) -> Dict[str, str]:
     cur_assets_val, cur_assets_key = _choose([
         (*_find_item_value(bal_yr, cur_assets_candidates),),
         (*_find_item_value(bal_q, cur_assets_candidates),),
-        (info.get("totalCurrentAssets"), "info.totalCurrentAssets"),
+        (lambda: info.get("totalCurrentAssets"), "info.totalCurrentAssets"),
     ])
     log.debug("Current Assets: %s via %s", cur_assets_val, cur_assets_key)
 
     cur_liab_val, cur_liab_key = _choose([
         (*_find_item_value(bal_yr, cur_liab_candidates),),
         (*_find_item_value(bal_q, cur_liab_candidates),),
-        (info.get("totalCurrentLiabilities"), "info.totalCurrentLiabilities"),
+        (lambda: info.get("totalCurrentLiabilities"), "info.totalCurrentLiabilities"),
     ])
     log.debug("Current Liabilities: %s via %s", cur_liab_val, cur_liab_key)
 
@@ -183,7 +238,7 @@ def fetch_ratios_no_nans(ticker_symbol: str) -> Dict[str, str]:
     inventory_val, inventory_key = _choose([
         (*_find_item_value(bal_yr, inventory_candidates),),
         (*_find_item_value(bal_q, inventory_candidates),),
-        (info.get("inventory"), "info.inventory"),
+        (lambda: info.get("inventory"), "info.inventory"),
     ])
     log.debug("Inventory: %s via %s", inventory_val, inventory_key)
 
@@ -199,17 +254,17 @@ def fetch_ratios_no_nans(ticker_symbol: str) -> Dict[str, str]:
     cash_val, cash_key = _choose([
         (*_find_item_value(bal_yr, cash_candidates),),
         (*_find_item_value(bal_q, cash_candidates),),
-        (info.get("cash"), "info.cash"),
+        (lambda: info.get("cash"), "info.cash"),
     ])
     sti_val, sti_key = _choose([
         (*_find_item_value(bal_yr, sti_candidates),),
         (*_find_item_value(bal_q, sti_candidates),),
-        (info.get("shortTermInvestments"), "info.shortTermInvestments"),
+        (lambda: info.get("shortTermInvestments"), "info.shortTermInvestments"),
     ])
     recv_val, recv_key = _choose([
         (*_find_item_value(bal_yr, recv_candidates),),
         (*_find_item_value(bal_q, recv_candidates),),
-        (info.get("netReceivables"), "info.netReceivables"),
+        (lambda: info.get("netReceivables"), "info.netReceivables"),
     ])
     log.debug("Cash=%s (%s), ShortTermInv=%s (%s), Receivables=%s (%s)",
               cash_val, cash_key, sti_val, sti_key, recv_val, recv_key)
@@ -223,21 +278,23 @@ def fetch_ratios_no_nans(ticker_symbol: str) -> Dict[str, str]:
     short_debt, short_src = _choose([
         (*_find_item_value(bal_yr, debt_parts_candidates[0][0]),),
         (*_find_item_value(bal_q, debt_parts_candidates[0][0]),),
-        (info.get("shortLongTermDebt"), "info.shortLongTermDebt"),
-        (info.get("shortTermDebt"), "info.shortTermDebt"),
+        (lambda: info.get("shortLongTermDebt"), "info.shortLongTermDebt"),
+        (lambda: info.get("shortTermDebt"), "info.shortTermDebt"),
     ])
     long_debt, long_src = _choose([
         (*_find_item_value(bal_yr, debt_parts_candidates[1][0]),),
         (*_find_item_value(bal_q, debt_parts_candidates[1][0]),),
-        (info.get("longTermDebt"), "info.longTermDebt"),
+        (lambda: info.get("longTermDebt"), "info.longTermDebt"),
     ])
     total_debt = None
     if short_debt is not None or long_debt is not None:
         total_debt = (short_debt or 0.0) + (long_debt or 0.0)
+        debt_src = " + ".join(src for src in (short_src, long_src) if src)
         log.debug("Debt from parts: short=%s (%s) + long=%s (%s) => total=%s",
                   short_debt, short_src, long_debt, long_src, total_debt)
     else:
         total_debt = info.get("totalDebt")
+        debt_src = "info.totalDebt"
         log.debug("Debt from info.totalDebt => %s", total_debt)
 
     # --- Income statement items ---
@@ -253,13 +310,9 @@ def fetch_ratios_no_nans(ticker_symbol: str) -> Dict[str, str]:
         ni_src = f"annual:{ni_yr_key}"
     elif ni_q is not None:
         # Sum last 4 quarters if available
-        try:
-            vals = inc_q.loc[ni_q_key].dropna().astype(float)
-            net_income = float(vals.iloc[:4].sum()) if len(vals) >= 1 else float(ni_q)
-            ni_src = f"quarterly_sum:{ni_q_key}"
-        except Exception:
-            net_income = ni_q
-            ni_src = f"quarterly:{ni_q_key}"
+        vals = list(inc_q.reported(ni_q_key).values())
+        net_income = float(sum(vals[:4])) if len(vals) >= 1 else float(ni_q)
+        ni_src = f"quarterly_sum:{ni_q_key}"
     else:
         net_income = info.get("netIncomeToCommon") or info.get("netIncome")
         ni_src = "info"
@@ -270,36 +323,31 @@ def fetch_ratios_no_nans(ticker_symbol: str) -> Dict[str, str]:
     ebit_val, ebit_key = _choose([
         (*_find_item_value(inc_yr, ebit_candidates),),
         (*_find_item_value(inc_q, ebit_candidates),),
-        (info.get("ebitda") if info.get("depreciation") is not None else None, "approx from info.ebitda - depreciation (not applied)"),
+        (lambda: info.get("ebitda") if info.get("depreciation") is not None else None, "approx from info.ebitda - depreciation (not applied)"),
     ])
     log.debug("EBIT: %s via %s", ebit_val, ebit_key)
 
     # For averages, try to compute 2-period averages if columns exist
-    def _two_period_avg(df: Optional[pd.DataFrame], candidates: List[str]) -> Optional[float]:
-        if df is None or df.empty:
+    def _two_period_avg(stmt: Optional[CompactStatement], candidates: List[str]) -> Optional[float]:
+        if stmt is None or stmt.empty:
             return None
-        idx_val, idx_key = _find_item_value(df, candidates)
+        idx_val, idx_key = _find_item_value(stmt, candidates)
         if idx_val is None:
             return None
-        try:
-            row = df.loc[idx_key].dropna().astype(float)
-            if len(row) >= 2:
-                avg = float(row.iloc[:2].mean())
-                log.debug("Avg(2) for %s => %s", idx_key, avg)
-                return avg
-            return float(row.iloc[0])
-        except Exception:
-            return float(row.iloc[0]) # Use the latest if only one period is available
-        except Exception:
-            return idx_val
+        row = list(stmt.reported(idx_key).values())
+        if len(row) >= 2:
+            avg = (row[0] + row[1]) / 2
+            log.debug("Avg(2) for %s => %s", idx_key, avg)
+            return avg
+        return row[0] if row else idx_val # Use the latest if only one period is available
 
     assets_series_2_yr = _series_two(bal_yr, assets_candidates)
     assets_series_2_q  = _series_two(bal_q, assets_candidates)
-    assets_series_2 = assets_series_2_yr if assets_series_2_yr is not None and not assets_series_2_yr.empty else assets_series_2_q
+    assets_series_2 = assets_series_2_yr if assets_series_2_yr else assets_series_2_q
 
     cliab_series_2_yr = _series_two(bal_yr, cur_liab_candidates)
     cliab_series_2_q  = _series_two(bal_q, cur_liab_candidates)
-    cliab_series_2 = cliab_series_2_yr if cliab_series_2_yr is not None and not cliab_series_2_yr.empty else cliab_series_2_q
+    cliab_series_2 = cliab_series_2_yr if cliab_series_2_yr else cliab_series_2_q
 
     avg_equity = _choose([
         (_two_period_avg(bal_yr, equity_candidates), "annual avg equity"),
@@ -318,14 +366,19 @@ def fetch_ratios_no_nans(ticker_symbol: str) -> Dict[str, str]:
     ce_latest = (assets_val if assets_val is not None else 0.0) - (cur_liab_val if cur_liab_val is not None else 0.0)
 
     cap_employed_avg = ce_latest # Default to latest
+    ce_src = "latest capital employed"
 
     if assets_series_2 is not None and cliab_series_2 is not None and len(assets_series_2) == len(cliab_series_2) and len(assets_series_2) >= 1:
         try:
-            cap_employed_avg = float((assets_series_2 - cliab_series_2).mean())
+            # Average over the periods both items were reported in
+            employed = [assets_series_2[p] - cliab_series_2[p] for p in assets_series_2 if p in cliab_series_2]
+            cap_employed_avg = sum(employed) / len(employed) if employed else float("nan")
+            ce_src = f"avg capital employed ({len(assets_series_2)} periods)"
             log.debug("Capital Employed (avg of %d) => %s", len(assets_series_2), cap_employed_avg)
         except Exception as e:
             log.warning("Failed to compute average Capital Employed: %s", e)
             cap_employed_avg = ce_latest
+            ce_src = "latest capital employed"
             log.debug("Capital Employed (latest) => %s", cap_employed_avg)
     else:
         log.debug("Capital Employed (latest) => %s", cap_employed_avg)
@@ -354,29 +407,36 @@ def fetch_ratios_no_nans(ticker_symbol: str) -> Dict[str, str]:
     if any(p is not None for p in parts) and cur_liab_val not in (None, 0):
         quick_assets = (cash_val or 0.0) + (sti_val or 0.0) + (recv_val or 0.0)
         quick_ratio = safe_div(quick_assets, cur_liab_val)
+        quick_src = "(cash + short term investments + receivables) / current liabilities"
         log.debug("Quick ratio via (Cash+STI+Receivables)/CL: qa=%s, cl=%s => %s",
                   quick_assets, cur_liab_val, quick_ratio)
     else:
         # fallback using (current assets - inventory)/current liabilities
         if cur_assets_val is not None and cur_liab_val not in (None, 0):
             quick_ratio = safe_div((cur_assets_val - (inventory_val or 0.0)), cur_liab_val)
+            quick_src = "(current assets - inventory) / current liabilities"
             log.debug("Quick ratio via (CA-Inventory)/CL: ca=%s, inv=%s, cl=%s => %s",
                       cur_assets_val, inventory_val, cur_liab_val, quick_ratio)
         else:
             quick_ratio = None
+            quick_src = None
             log.debug("Quick ratio could not be computed from either method.")
 
     # ROE = Net Income / Avg Equity
     roe = safe_div(net_income, avg_equity)
+    roe_src = f"{ni_src} / avg equity"
     # Fallback to info.returnOnEquity if needed
     if roe is None and isinstance(info.get("returnOnEquity"), (int, float)):
         roe = float(info["returnOnEquity"])
+        roe_src = "info.returnOnEquity"
         log.debug("ROE fallback to info.returnOnEquity => %s", roe)
 
     # ROA = Net Income / Avg Assets
     roa = safe_div(net_income, avg_assets)
+    roa_src = f"{ni_src} / avg assets"
     if roa is None and isinstance(info.get("returnOnAssets"), (int, float)):
         roa = float(info["returnOnAssets"])
+        roa_src = "info.returnOnAssets"
         log.debug("ROA fallback to info.returnOnAssets => %s", roa)
 
     # ROCE = EBIT / Capital Employed (avg if available)
@@ -388,21 +448,29 @@ def fetch_ratios_no_nans(ticker_symbol: str) -> Dict[str, str]:
     pe = trailing_pe
 
     # ---------------------------
-    # Final, with no NaNs (strings)
+    # Final, with no NaNs (None for missing)
     # ---------------------------
-    result = {
-        "Debt to Equity": _pretty(d_to_e),
-        "Price to Earnings": _pretty(pe),
-        "Current Ratio": _pretty(current_ratio),
-        "Quick Ratio": _pretty(quick_ratio),
-        "ROCE": _pretty(roce),
-        "ROE": _pretty(roe),
-        "ROA": _pretty(roa),
+    values = {
+        "Debt to Equity": _finite(d_to_e),
+        "Price to Earnings": _finite(pe),
+        "Current Ratio": _finite(current_ratio),
+        "Quick Ratio": _finite(quick_ratio),
+        "ROCE": _finite(roce),
+        "ROE": _finite(roe),
+        "ROA": _finite(roa),
     }
-
-    # Helpful recap in logs
-    log.info("Computed ratios for %s => %s", ticker_symbol, result)
-    return result
+    sources = {
+        "Debt to Equity": f"{debt_src} / {equity_key}",
+        "Price to Earnings": pe_src,
+        "Current Ratio": f"{cur_assets_key} / {cur_liab_key}",
+        "Quick Ratio": quick_src,
+        "ROCE": f"{ebit_key} / {ce_src}",
+        "ROE": roe_src,
+        "ROA": roa_src,
+    }
+    # Only describe the derivation of ratios we actually produced
+    sources = {name: (src if values[name] is not None else None) for name, src in sources.items()}
+    return values, sources
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+"""
+Near-duplicate headline collapse.
+
+Google News returns the same syndicated story under slightly different titles
+("Apple beats estimates - Reuters", "Apple beats estimates, shares rise -
+Yahoo Finance"). Scoring every copy wastes inference and over-weights repeated
+stories, so headlines are grouped before sentiment is computed:
+
+  1. exact grouping on a normalized form (case, punctuation and the trailing
+     " - Publisher" removed), then
+  2. MinHash over character shingles, merging groups whose estimated Jaccard
+     similarity is at least DEDUP_THRESHOLD.
+
+Each group is represented by its first (most recent) headline and carries a
+weight that grows sublinearly with its size: a story syndicated five times
+counts for more than one mention, but not five times as much.
+"""
+from __future__ import annotations
+
+import math
+import re
+import zlib
+from typing import List, Tuple
+
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+DEDUP_THRESHOLD = 0.7
+NUM_PERMUTATIONS = 64
+SHINGLE_SIZE = 4
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_PUBLISHER_SUFFIX = re.compile(r"\s+[-|–—]\s+[^-|–—]{1,60}$")
+_NON_WORD = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+_permutations = None
+
+
+def normalize_headline(headline: str) -> str:
+    """Lowercase, drop the publisher suffix and punctuation, collapse whitespace"""
+    text = _PUBLISHER_SUFFIX.sub("", headline.strip())
+    text = _NON_WORD.sub(" ", text.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _shingle_hashes(text: str) -> List[int]:
+    if len(text) <= SHINGLE_SIZE:
+        return [zlib.crc32(text.encode())]
+    return list({zlib.crc32(text[i:i + SHINGLE_SIZE].encode()) for i in range(len(text) - SHINGLE_SIZE + 1)})
+
+
+def _get_permutations():
+    global _permutations
+    if _permutations is None:
+        rng = np.random.default_rng(0x5EED)
+        a = rng.integers(1, 1 << 31, size=(NUM_PERMUTATIONS, 1), dtype=np.uint64)
+        b = rng.integers(0, 1 << 32, size=(NUM_PERMUTATIONS, 1), dtype=np.uint64)
+        _permutations = (a, b)
+    return _permutations
+
+
+def minhash_signature(text: str):
+    """MinHash signature (NUM_PERMUTATIONS values) of a normalized headline"""
+    a, b = _get_permutations()
+    hashes = np.array(_shingle_hashes(text), dtype=np.uint64)
+    # a < 2**31 and 32-bit shingle hashes keep a * h + b below 2**64
+    return ((a * hashes + b) % _MERSENNE_PRIME).min(axis=1)
+
+
+def headline_weight(group_size: int) -> float:
+    """Weight of a group of ``group_size`` near-identical headlines"""
+    return 1.0 + math.log(group_size)
+
+
+def collapse_headlines(headlines: List[str], threshold: float = DEDUP_THRESHOLD) -> List[Tuple[str, int]]:
+    """
+    Group near-duplicate headlines.
+
+    Returns:
+        list: (representative headline, group size) in first-seen order
+    """
+    # Exact duplicates after normalization
+    exact = {}
+    for headline in headlines:
+        key = normalize_headline(headline)
+        if key in exact:
+            exact[key][1] += 1
+        else:
+            exact[key] = [headline, 1]
+    keys = list(exact)
+    if len(keys) < 2:
+        return [tuple(group) for group in exact.values()]
+
+    # Near duplicates: union groups whose signatures agree on enough positions
+    signatures = np.stack([minhash_signature(key) for key in keys])
+    similarity = (signatures[:, None, :] == signatures[None, :, :]).mean(axis=2)
+    parent = list(range(len(keys)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(*np.nonzero(np.triu(similarity >= threshold, k=1))):
+        root_i, root_j = find(int(i)), find(int(j))
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups = {}
+    for i, key in enumerate(keys):
+        root = find(i)
+        if root in groups:
+            groups[root][1] += exact[key][1]
+        else:
+            groups[root] = [exact[keys[root]][0], exact[key][1]]
+    return [tuple(group) for group in groups.values()]
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Optional
+
+from lazy_imports import lazy_import
+
+requests = lazy_import("requests")
+
+logger = logging.getLogger(__name__)
+
+# Maximum concurrent requests per upstream host. The async fetch layer uses
+# these as semaphore sizes, and the HTTP pool is sized to match so every
+# in-flight request can reuse a kept-alive connection.
+HOST_LIMITS = {
+    "yfinance": 8,
+    "news.google.com": 4,
+}
+
+DEFAULT_TIMEOUT = 10  # seconds
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide pooled HTTP session.
+
+    yfinance keeps its own shared session internally, so this one is used for
+    the remaining upstreams (Google News RSS).
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=len(HOST_LIMITS),
+                    pool_maxsize=max(HOST_LIMITS.values()),
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"User-Agent": "credtech-credit-score/1.0"})
+                _session = session
+    return _session
+
+
+def get_bytes(url: str, timeout: float = DEFAULT_TIMEOUT) -> bytes:
+    """GET a URL through the pooled session and return the raw body."""
+    response = get_session().get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.content
@@ -0,0 +1,42 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    Lets modules keep ``yf = lazy_import("yfinance")`` at the top while the
+    real import cost is paid by the first request that needs it, not at
+    process start.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a proxy for ``name`` that imports it on first use."""
+    return LazyModule(name)
+
+
+def preload(*names: str) -> None:
+    """Import the named modules now, e.g. from a warm-up hook."""
+    for name in names:
+        importlib.import_module(name)
@@ -0,0 +1,55 @@
+"""
+Short-lived cache of tickers that could not be scored, and why.
+
+Typos and delisted symbols otherwise go through every upstream call on each
+request before failing again. Tickers whose statements came back empty
+(``no_data``) or whose lookup failed (``error``) are remembered for ``ttl``
+seconds, so repeat requests are rejected with the cached reason without
+touching yfinance. Transient upstream failures (throttling, outages) are not
+cached; ``resilience`` deals with those.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+DEFAULT_TTL = 300.0
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class NegativeCache:
+    """Thread-safe ticker -> (failure reason, expiry) map with a TTL and an LRU bound."""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, ticker: str, reason: str) -> None:
+        with self._lock:
+            self._entries[ticker] = (reason, time.monotonic() + self.ttl)
+            self._entries.move_to_end(ticker)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, ticker: str) -> Optional[Tuple[str, float]]:
+        """(reason, seconds until expiry) if the ticker is cached and not expired"""
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is None:
+                return None
+            reason, expires = entry
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                del self._entries[ticker]
+                return None
+            return reason, remaining
+
+    def invalidate(self, ticker: str) -> bool:
+        """Forget a ticker; True if it was cached"""
+        with self._lock:
+            return self._entries.pop(ticker, None) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,196 @@
+"""
+Opt-in per-request profiling for slow analyses.
+
+Profiling is enabled by setting PROFILE_DIR. A request is then profiled when
+either:
+  - it carries an ``X-Profile-Token`` header equal to PROFILE_TOKEN, or
+  - it is picked by random sampling at PROFILE_SAMPLE_RATE (0-1, default 0),
+    which is cheap enough to leave on at a low rate in production.
+
+Two profilers are available (PROFILE_MODE):
+  - ``sample`` (default): a background thread samples the request thread's
+    stack every PROFILE_INTERVAL seconds and writes collapsed stacks
+    (``.folded``), which flamegraph.pl and speedscope read directly. The
+    async fetch layer does its work on executor threads while the request
+    thread waits in ``asyncio.run``, so busy threads named with a
+    PROFILE_THREADS prefix (default: the ``upstream`` and ``sentiment`` pools)
+    are sampled too, under a root frame named after the pool. Those pools
+    are shared, so concurrent requests show up in each other's profiles.
+  - ``cprofile``: deterministic cProfile, written as ``.prof``. It only sees
+    the request thread, so by default it is limited to company analysis.
+
+Each profile gets a ``.json`` sidecar with the ticker, path, status and timing.
+Only paths under PROFILE_PATHS (comma-separated prefixes) are profiled.
+"""
+import cProfile
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from flask import Flask, g, request
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile-Token'
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack, and those of busy pool threads, at a fixed interval."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005, thread_prefixes: tuple = ()):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.thread_prefixes = thread_prefixes
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            self._sample(frames.get(self.thread_id))
+            for thread in threading.enumerate():
+                pool = next((p for p in self.thread_prefixes if thread.name.startswith(p)), None)
+                if pool is not None and thread.ident in frames:
+                    self._sample(frames[thread.ident], root=pool)
+
+    def _sample(self, frame, root: Optional[str] = None) -> None:
+        # An idle pool thread waits inside the executor's _worker loop
+        if root is not None and frame is not None and frame.f_code.co_name == '_worker':
+            return
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if stack:
+            if root is not None:
+                stack.append(root)
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str) -> None:
+        """Write collapsed stacks: one 'frame;frame;frame count' line per stack."""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfiler:
+    """Flask extension that profiles selected requests into a local directory."""
+
+    def __init__(
+        self,
+        app: Optional[Flask] = None,
+        profile_dir: Optional[str] = None,
+        token: Optional[str] = None,
+        sample_rate: float = 0.0,
+        mode: str = 'sample',
+        interval: float = 0.005,
+        paths: Optional[tuple] = None,
+        thread_prefixes: tuple = ('upstream', 'sentiment'),
+    ):
+        if mode not in ('sample', 'cprofile'):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.profile_dir = profile_dir
+        self.token = token
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.interval = interval
+        if paths is None:
+            paths = ('/api/company-analysis',) if mode == 'cprofile' else ('/api/company-analysis', '/api/batch-analysis')
+        self.paths = paths
+        self.thread_prefixes = thread_prefixes
+        if app is not None:
+            self.init_app(app)
+
+    @classmethod
+    def from_env(cls, app: Optional[Flask] = None) -> "RequestProfiler":
+        paths = os.environ.get('PROFILE_PATHS')
+        threads = os.environ.get('PROFILE_THREADS')
+        return cls(
+            app,
+            profile_dir=os.environ.get('PROFILE_DIR'),
+            token=os.environ.get('PROFILE_TOKEN'),
+            sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+            mode=os.environ.get('PROFILE_MODE', 'sample'),
+            interval=float(os.environ.get('PROFILE_INTERVAL', 0.005)),
+            **({'paths': tuple(p.strip() for p in paths.split(','))} if paths else {}),
+            **({'thread_prefixes': tuple(t.strip() for t in threads.split(',') if t.strip())}
+               if threads is not None else {}),
+        )
+
+    def init_app(self, app: Flask) -> None:
+        if not self.profile_dir:
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        app.before_request(self._before)
+        app.after_request(self._after)
+        logger.info(f"Request profiling enabled ({self.mode}, sample rate {self.sample_rate}) -> {self.profile_dir}")
+
+    def _should_profile(self) -> bool:
+        if not request.path.startswith(self.paths):
+            return False
+        supplied = request.headers.get(PROFILE_HEADER)
+        if supplied and self.token and hmac.compare_digest(supplied, self.token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _before(self) -> None:
+        if not self._should_profile():
+            return
+        if self.mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = SamplingProfiler(threading.get_ident(), self.interval, self.thread_prefixes)
+            profiler.start()
+        g._profiler = profiler
+        g._profile_started = time.perf_counter()
+
+    def _after(self, response):
+        profiler = g.pop('_profiler', None)
+        if profiler is None:
+            return response
+        if self.mode == 'cprofile':
+            profiler.disable()
+        else:
+            profiler.stop()
+        duration_ms = (time.perf_counter() - g.pop('_profile_started')) * 1000
+
+        ticker = (request.view_args or {}).get('ticker', 'request').upper()
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+        base = os.path.join(self.profile_dir, f"{stamp}-{ticker}-{duration_ms:.0f}ms")
+        try:
+            if self.mode == 'cprofile':
+                profiler.dump_stats(f"{base}.prof")
+            else:
+                profiler.write(f"{base}.folded")
+            with open(f"{base}.json", 'w') as f:
+                json.dump({
+                    'ticker': ticker,
+                    'path': request.path,
+                    'method': request.method,
+                    'status': response.status_code,
+                    'duration_ms': round(duration_ms, 2),
+                    'mode': self.mode,
+                    'started_at': stamp,
+                }, f, indent=2)
+            logger.info(f"Profiled {request.path} in {duration_ms:.0f} ms -> {base}")
+        except OSError as e:
+            logger.warning(f"Could not write profile for {request.path}: {e}")
+        return response
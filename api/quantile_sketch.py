@@ -0,0 +1,263 @@
+"""
+Universe-relative score normalization with mergeable quantile sketches.
+
+The fixed bounds used by ``normalize_score`` put most large caps at the limits
+of the 0-100 range. ``UniverseNormalizer`` instead maps a raw Altman Z or
+Ohlson O score to its percentile among the companies scored so far.
+
+The distribution is kept in a KLL sketch: a small stack of compactors whose
+size is bounded by ~3k items regardless of how many values are added, with
+rank error around 1.7/k. Sketches from different processes merge into one
+that is as accurate as if it had seen all the values, so shard workers can each
+build their own and the results are combined at the end. For lookups the
+sketch is flattened once into the values at CDF_RESOLUTION evenly spaced
+ranks, so the percentile of a new score is a binary search over that table.
+Sampling by rank rather than on a uniform value grid keeps the resolution
+where the scores are: a single Altman Z outlier (X4 is market cap over
+liabilities) no longer flattens the rest of the distribution.
+"""
+import json
+import math
+import os
+import random
+import threading
+from bisect import bisect_right
+from typing import List, Optional, Tuple
+
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+DEFAULT_K = 200
+CDF_RESOLUTION = 1024
+# Below this many observations the universe is too small to rank against
+DEFAULT_MIN_COUNT = 50
+
+
+class KLLSketch:
+    """Streaming quantile sketch (Karnin, Lang & Liberty)."""
+
+    def __init__(self, k: int = DEFAULT_K, seed: Optional[int] = None):
+        self.k = k
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.compactors: List[List[float]] = [[]]
+        self._rng = random.Random(seed)
+        self._cdf: Optional[Tuple[float, float, List[float]]] = None
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self) -> None:
+        while sum(map(len, self.compactors)) >= sum(self._capacity(h) for h in range(len(self.compactors))):
+            for level, items in enumerate(self.compactors):
+                if len(items) >= self._capacity(level):
+                    if level + 1 == len(self.compactors):
+                        self.compactors.append([])
+                    items.sort()
+                    # An odd item out stays behind; every other remaining item moves up with double weight
+                    keep = [items.pop()] if len(items) % 2 else []
+                    self.compactors[level + 1].extend(items[self._rng.randint(0, 1)::2])
+                    self.compactors[level] = keep
+                    break
+
+    def update(self, value: float) -> None:
+        value = float(value)
+        if not math.isfinite(value):
+            return
+        self.compactors[0].append(value)
+        self.n += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self._cdf = None
+        self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        """Fold ``other`` into this sketch."""
+        if other.k != self.k:
+            raise ValueError(f"Cannot merge sketches with different k ({self.k} vs {other.k})")
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._cdf = None
+        self._compress()
+
+    def _weighted_items(self) -> Tuple[List[float], List[float]]:
+        """Sorted values and their cumulative weights"""
+        items = sorted((value, 1 << level) for level, values in enumerate(self.compactors) for value in values)
+        values, cumulative, total = [], [], 0
+        for value, weight in items:
+            total += weight
+            values.append(value)
+            cumulative.append(total)
+        return values, cumulative
+
+    def quantile(self, q: float) -> float:
+        """Approximate value at quantile ``q`` (0-1)"""
+        if self.n == 0:
+            raise ValueError("Empty sketch")
+        values, cumulative = self._weighted_items()
+        target = q * cumulative[-1]
+        for value, weight in zip(values, cumulative):
+            if weight >= target:
+                return value
+        return values[-1]
+
+    def _build_cdf(self) -> List[float]:
+        """Values at CDF_RESOLUTION + 1 evenly spaced ranks, from min to max"""
+        values, cumulative = self._weighted_items()
+        total = cumulative[-1]
+        table, index = [], 0
+        for i in range(CDF_RESOLUTION + 1):
+            target = i * total / CDF_RESOLUTION
+            while index < len(values) - 1 and cumulative[index] < target:
+                index += 1
+            table.append(values[index])
+        table[0], table[-1] = self.min, self.max
+        return table
+
+    def percentile(self, value: float) -> float:
+        """Approximate fraction (0-1) of observed values at or below ``value``"""
+        if self.n == 0:
+            return 0.5
+        if value < self.min:
+            return 0.0
+        if value > self.max:
+            return 1.0
+        if self.max == self.min:
+            return 0.5
+        if value == self.max:
+            return 1.0
+        if self._cdf is None:
+            self._cdf = self._build_cdf()
+        table = self._cdf
+        # table[index] <= value < table[index + 1]; interpolate the rank in between
+        index = bisect_right(table, value) - 1
+        return (index + (value - table[index]) / (table[index + 1] - table[index])) / CDF_RESOLUTION
+
+    def percentiles(self, values):
+        """``percentile`` of each value in a NumPy array, from the same table"""
+        values = np.asarray(values, dtype=np.float64)
+        if self.n == 0:
+            return np.full(values.shape, 0.5)
+        if self.max == self.min:
+            return np.where(values < self.min, 0.0, np.where(values > self.max, 1.0, 0.5))
+        if self._cdf is None:
+            self._cdf = self._build_cdf()
+        table = np.asarray(self._cdf)
+        index = np.clip(np.searchsorted(table, values, side='right') - 1, 0, CDF_RESOLUTION - 1)
+        low, high = table[index], table[index + 1]
+        fraction = np.divide(values - low, high - low, out=np.zeros(values.shape), where=high > low)
+        result = (index + fraction) / CDF_RESOLUTION
+        result[values < self.min] = 0.0
+        result[values >= self.max] = 1.0
+        return result
+
+    def to_dict(self) -> dict:
+        return {'k': self.k, 'n': self.n, 'min': self.min, 'max': self.max, 'compactors': self.compactors}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "KLLSketch":
+        sketch = cls(k=data['k'])
+        sketch.n = data['n']
+        sketch.min = data['min'] if data['n'] else math.inf
+        sketch.max = data['max'] if data['n'] else -math.inf
+        sketch.compactors = [list(map(float, items)) for items in data['compactors']] or [[]]
+        return sketch
+
+
+class UniverseNormalizer:
+    """
+    Percentile normalization of Altman Z and Ohlson O against the scored universe.
+
+    ``normalize_altman``/``normalize_ohlson`` return None until ``min_count``
+    companies have been observed; callers then fall back to fixed bounds.
+    With ``learn=False`` the normalizer is used as a fixed reference and
+    scoring does not add to it.
+    """
+
+    def __init__(self, k: int = DEFAULT_K, min_count: int = DEFAULT_MIN_COUNT, learn: bool = True):
+        self.altman = KLLSketch(k)
+        self.ohlson = KLLSketch(k)
+        self.min_count = min_count
+        self.learn = learn
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return self.altman.n
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.min_count
+
+    def update(self, altman: float, ohlson: float) -> None:
+        with self._lock:
+            self.altman.update(altman)
+            self.ohlson.update(ohlson)
+
+    def merge(self, other: "UniverseNormalizer") -> None:
+        with self._lock:
+            self.altman.merge(other.altman)
+            self.ohlson.merge(other.ohlson)
+
+    def normalize_altman(self, altman: float) -> Optional[float]:
+        """Altman Z percentile on a 0-100 scale (higher is safer)"""
+        if not self.ready:
+            return None
+        with self._lock:
+            return 100 * self.altman.percentile(altman)
+
+    def normalize_ohlson(self, ohlson: float) -> Optional[float]:
+        """Inverted Ohlson O percentile on a 0-100 scale (higher is safer)"""
+        if not self.ready:
+            return None
+        with self._lock:
+            return 100 - 100 * self.ohlson.percentile(ohlson)
+
+    def normalize_arrays(self, altman, ohlson) -> Optional[Tuple["np.ndarray", "np.ndarray"]]:
+        """``normalize_altman`` and ``normalize_ohlson`` over NumPy arrays of scores"""
+        if not self.ready:
+            return None
+        with self._lock:
+            return 100 * self.altman.percentiles(altman), 100 - 100 * self.ohlson.percentiles(ohlson)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {'altman': self.altman.to_dict(), 'ohlson': self.ohlson.to_dict(), 'min_count': self.min_count}
+
+    @classmethod
+    def from_dict(cls, data: dict, learn: bool = True) -> "UniverseNormalizer":
+        normalizer = cls(k=data['altman']['k'], min_count=data.get('min_count', DEFAULT_MIN_COUNT), learn=learn)
+        normalizer.altman = KLLSketch.from_dict(data['altman'])
+        normalizer.ohlson = KLLSketch.from_dict(data['ohlson'])
+        return normalizer
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, learn: bool = True) -> "UniverseNormalizer":
+        with open(path) as f:
+            return cls.from_dict(json.load(f), learn=learn)
+
+
+if __name__ == "__main__":
+    rng = random.Random(1)
+    halves = [UniverseNormalizer(), UniverseNormalizer()]
+    for i in range(100_000):
+        halves[i % 2].update(rng.gauss(3, 2), rng.gauss(-2, 1.5))
+    universe = halves[0]
+    universe.merge(halves[1])
+    print(f"{universe.count} companies, sketch holds {sum(map(len, universe.altman.compactors))} Altman values")
+    for z in (-1.0, 1.81, 3.0, 5.0, 9.0):
+        print(f"Altman Z {z:5.2f} -> percentile {universe.normalize_altman(z):5.1f}")
@@ -0,0 +1,215 @@
+"""
+Bulk market quotes, and market fields derived from the statements.
+
+The scoring model needs market cap and the ratios need price, trailing EPS and
+P/E. All of these used to come from ``Ticker.info``, the slowest per-ticker
+yfinance call. Instead:
+
+  - prices for a whole batch come from one ``yf.download`` call
+    (``fetch_quotes``),
+  - shares outstanding and trailing EPS come from the quarterly statements
+    that are fetched anyway (``market_cap``, ``trailing_eps``),
+  - ``info`` is wrapped in ``LazyInfo`` and only downloaded if a fallback
+    actually reads it.
+
+Price x statement figures are only meaningful when the statements are in the
+quote currency and one share is one ordinary share. ADRs (TSM, BABA, SONY)
+quote in USD per depositary receipt while their statements report in the home
+currency per ordinary share, so ``statement_values_usable`` checks the
+listing first. That check needs ``info``, so the verdicts are kept for the
+life of the process and can be saved to a JSON file (``save_listing_checks``)
+that later runs and the API load (``load_listing_checks``, LISTING_CHECKS_PATH).
+With the file in place a ticker's ``info`` is only downloaded the first time it
+is ever checked, or when a fallback needs it.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+from collections.abc import Mapping
+from typing import Dict, List, Optional
+
+from http_pool import HOST_LIMITS
+from lazy_imports import lazy_import
+from rate_limit import RetryBudget, UpstreamThrottled, call_upstream, yf_attr
+from statements import CompactStatement
+
+yf = lazy_import("yfinance")
+pd = lazy_import("pandas")
+
+logger = logging.getLogger(__name__)
+
+SHARES_ITEMS = ("Ordinary Shares Number", "Share Issued")
+EPS_ITEM = "Diluted EPS"
+DEPOSITARY_WORDS = {"ADR", "ADS"}
+
+LISTING_CHECKS_PATH = os.environ.get('LISTING_CHECKS_PATH')
+
+_listing_checks: Dict[str, bool] = {}
+
+
+def fetch_quotes(tickers: List[str], budget: Optional[RetryBudget] = None) -> Dict[str, dict]:
+    """
+    Latest price for many tickers in one batched download.
+
+    Returns {ticker: {'price': float}} for the tickers that have a price;
+    on failure returns what it has (possibly nothing) and callers fall back to
+    per-ticker sources.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return {}
+
+    def download(attempt):
+        return yf.download(
+            tickers, period="5d", interval="1d", auto_adjust=False,
+            progress=False, threads=min(len(tickers), HOST_LIMITS["yfinance"]),
+        )
+
+    try:
+        data = call_upstream("yfinance", download, budget=budget, is_empty=lambda df: df is None or df.empty)
+    except UpstreamThrottled as e:
+        logger.warning(f"Bulk quotes throttled: {e}")
+        return {}
+    except Exception as e:
+        logger.warning(f"Bulk quotes failed for {len(tickers)} tickers: {e}")
+        return {}
+    if data is None or data.empty:
+        return {}
+
+    close = data["Close"]
+    if isinstance(close, pd.Series):  # single ticker without a ticker column level
+        close = close.to_frame(name=tickers[0])
+    quotes = {}
+    for ticker in tickers:
+        if ticker in close:
+            prices = close[ticker].dropna()
+            if len(prices):
+                quotes[ticker] = {'price': float(prices.iloc[-1])}
+    logger.info(f"Fetched bulk quotes for {len(quotes)} of {len(tickers)} tickers")
+    return quotes
+
+
+def _latest_reported(statement: CompactStatement, labels) -> Optional[float]:
+    for label in labels:
+        values = list(statement.reported(label).values())
+        if values:
+            return values[0]
+    return None
+
+
+def shares_outstanding(quarterly_bs: CompactStatement) -> Optional[float]:
+    """Latest reported share count from the quarterly balance sheet"""
+    shares = _latest_reported(quarterly_bs, SHARES_ITEMS)
+    return shares if shares and shares > 0 else None
+
+
+def market_cap(price: Optional[float], quarterly_bs: CompactStatement) -> Optional[float]:
+    """Price x latest reported shares outstanding, or None if either is missing"""
+    shares = shares_outstanding(quarterly_bs)
+    if price is None or shares is None:
+        return None
+    return price * shares
+
+
+def trailing_eps(quarterly_income: CompactStatement) -> Optional[float]:
+    """Sum of the last four quarters' diluted EPS (None without four quarters)"""
+    values = list(quarterly_income.reported(EPS_ITEM).values())[:4]
+    return sum(values) if len(values) == 4 else None
+
+
+def statement_values_usable(ticker: str, info) -> bool:
+    """
+    Whether quote price and statement figures can be combined for a ticker:
+    the statements are in the quote currency and the listing is not a
+    depositary receipt. Unknown currencies count as a mismatch.
+    """
+    usable = _listing_checks.get(ticker)
+    if usable is None:
+        financial_currency, quote_currency = info.get("financialCurrency"), info.get("currency")
+        name = f"{info.get('longName') or ''} {info.get('shortName') or ''}".upper()
+        depositary = "AMERICAN DEPOSITARY" in name or bool(set(re.findall(r"[A-Z]+", name)) & DEPOSITARY_WORDS)
+        usable = financial_currency is not None and financial_currency == quote_currency and not depositary
+        if not usable:
+            logger.info(f"{ticker}: statements in {financial_currency}, quoted in {quote_currency}; using info values")
+        _listing_checks[ticker] = usable
+    return usable
+
+
+def _read_listing_checks(path: str) -> Dict[str, bool]:
+    try:
+        with open(path) as f:
+            return {ticker: bool(usable) for ticker, usable in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, AttributeError) as e:
+        logger.warning(f"Ignoring unreadable listing checks in {path}: {e}")
+        return {}
+
+
+def load_listing_checks(path: str) -> int:
+    """Add the verdicts saved in ``path`` to this process's; returns how many were read"""
+    saved = _read_listing_checks(path)
+    for ticker, usable in saved.items():
+        _listing_checks.setdefault(ticker, usable)
+    logger.info(f"Loaded {len(saved)} listing checks from {path}")
+    return len(saved)
+
+
+def listing_checks(tickers: Optional[List[str]] = None) -> Dict[str, bool]:
+    """Verdicts known to this process, optionally only for ``tickers``"""
+    if tickers is None:
+        return dict(_listing_checks)
+    return {ticker: _listing_checks[ticker] for ticker in tickers if ticker in _listing_checks}
+
+
+def save_listing_checks(path: str, checks: Optional[Dict[str, bool]] = None) -> None:
+    """Merge ``checks`` (default: this process's verdicts) into the file at ``path``, atomically."""
+    merged = _read_listing_checks(path)
+    merged.update(listing_checks() if checks is None else checks)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(merged, f, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+class LazyInfo(Mapping):
+    """
+    ``Ticker.info`` downloaded on first access.
+
+    Holds only the symbol unless a shared ``stock`` is given, so that keeping
+    it around does not keep a Ticker's cached statements alive.
+    """
+
+    def __init__(self, ticker: str, budget: Optional[RetryBudget] = None, stock=None):
+        self.ticker = ticker
+        self._budget = budget
+        self._stock = stock
+        self._info: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._info is not None
+
+    def _load(self) -> dict:
+        if self._info is None:
+            with self._lock:
+                if self._info is None:
+                    stock = self._stock if self._stock is not None else yf.Ticker(self.ticker)
+                    logger.debug(f"Fetching full info for {self.ticker}")
+                    self._info = yf_attr(stock, "info", self._budget) or {}
+                    self._stock = None
+        return self._info
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
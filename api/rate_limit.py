@@ -0,0 +1,245 @@
+"""
+Central rate limiting for upstream calls (yfinance and Google News RSS).
+
+Every upstream call goes through ``call_upstream``, which takes a token from the
+host's bucket, retries 429/5xx responses with jittered exponential backoff, and
+charges each retry to the job's ``RetryBudget``. Buckets adapt their rate
+(additive increase, multiplicative decrease), so long runs settle at the
+highest rate the upstream tolerates instead of failing halfway.
+
+yfinance often answers a throttled request with an empty frame rather than an
+error. Empty results are retried once; if they are still empty while the host
+has recently throttled us, ``UpstreamThrottled`` is raised so the ticker is not
+mistaken for one that truly has no data.
+
+Each host also has a circuit breaker (see ``resilience``): while it is open,
+calls raise ``CircuitOpenError`` straight away instead of queueing for a
+token and retrying against a host that is down.
+
+The starting (and highest) rate per host is YFINANCE_RATE and NEWS_RATE
+requests per second. These cap a job's throughput however many processes it
+runs, so raise them for large universes if the upstream allows it.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from lazy_imports import lazy_import
+from resilience import BREAKERS, is_outage
+
+yf = lazy_import("yfinance")
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_WINDOW = 60.0  # seconds a throttle signal counts as "recent"
+
+
+class UpstreamThrottled(Exception):
+    """Raised when an upstream kept throttling us and retries ran out."""
+
+    def __init__(self, host: str, detail: str = ""):
+        super().__init__(f"{host} is throttling requests{': ' + detail if detail else ''}")
+        self.host = host
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose refill rate adapts to throttle signals."""
+
+    def __init__(self, rate: float, capacity: float, min_rate: float = 0.2, increase: float = 0.05):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.increase = increase
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._last_throttle = float("-inf")
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        """Block until a token is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * 0.5)
+            self._tokens = 0
+            self._last_throttle = time.monotonic()
+        logger.warning(f"Upstream throttled, rate reduced to {self.rate:.2f} req/s")
+
+    def split(self, parts: int) -> None:
+        """Keep 1/``parts`` of the rates and capacity, for one of ``parts`` processes sharing the host."""
+        with self._lock:
+            self.max_rate /= parts
+            self.rate /= parts
+            self.min_rate /= parts
+            self.capacity = max(1.0, self.capacity / parts)
+            self._tokens = min(self._tokens, self.capacity)
+
+    def recently_throttled(self, window: float = THROTTLE_WINDOW) -> bool:
+        return time.monotonic() - self._last_throttle < window
+
+
+class RetryBudget:
+    """Thread-safe cap on the number of retries one job may spend."""
+
+    def __init__(self, retries: int):
+        self.remaining = retries
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_job(cls, n_tickers: int, ratio: float = 0.2, minimum: int = 10) -> "RetryBudget":
+        return cls(max(minimum, int(n_tickers * ratio)))
+
+    def consume(self) -> bool:
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+RATES: Dict[str, float] = {
+    "yfinance": float(os.environ.get("YFINANCE_RATE", 10.0)),
+    "news.google.com": float(os.environ.get("NEWS_RATE", 2.0)),
+}
+
+# Capacity allows a burst of two seconds' worth of requests
+BUCKETS: Dict[str, TokenBucket] = {host: TokenBucket(rate=rate, capacity=2 * rate) for host, rate in RATES.items()}
+
+
+def set_rate(host: str, rate: float) -> None:
+    """Replace ``host``'s bucket with a fresh one at ``rate`` requests per second."""
+    RATES[host] = rate
+    BUCKETS[host] = TokenBucket(rate=rate, capacity=2 * rate)
+
+
+def _is_throttle_error(exc: Exception) -> bool:
+    if type(exc).__name__ == "YFRateLimitError":
+        return True
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return "Too Many Requests" in str(exc)
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def call_upstream(
+    host: str,
+    fn: Callable,
+    *args,
+    budget: Optional[RetryBudget] = None,
+    max_attempts: int = 5,
+    is_empty: Optional[Callable[[object], bool]] = None,
+    empty_retries: int = 1,
+):
+    """
+    Call ``fn(attempt, *args)`` for an upstream host under its rate limit.
+
+    Throttle errors are retried with backoff while the budget allows. Results
+    for which ``is_empty`` is true are retried up to ``empty_retries`` times and
+    then returned as-is, unless the host was recently throttled, in which case
+    ``UpstreamThrottled`` is raised. Empty retries only draw on the budget
+    while the host is being throttled, so tickers without data cannot use it
+    up and turn later ones into false "throttled" failures.
+
+    Raises ``resilience.CircuitOpenError`` without calling ``fn`` while the
+    host's circuit is open. Only the time spent in ``fn`` counts towards the
+    breaker's slow-call limit, not waiting for a token or backing off.
+    """
+    breaker = BREAKERS[host]
+    breaker.before_call()
+    try:
+        result, elapsed = _call_with_retries(host, fn, args, budget, max_attempts, is_empty, empty_retries)
+    except UpstreamThrottled as e:
+        breaker.on_failure(str(e))
+        raise
+    except Exception as e:
+        if is_outage(e, _is_throttle_error(e)):
+            breaker.on_failure(str(e))
+        else:
+            breaker.on_success()
+        raise
+    breaker.on_success(elapsed)
+    return result
+
+
+def _call_with_retries(host, fn, args, budget, max_attempts, is_empty, empty_retries):
+    """Returns the result and how long the ``fn`` call that produced it took."""
+    bucket = BUCKETS[host]
+    detail = ""
+    for attempt in range(max_attempts):
+        bucket.acquire()
+        started = time.monotonic()
+        try:
+            result = fn(attempt, *args)
+        except Exception as e:
+            if not _is_throttle_error(e):
+                raise
+            bucket.on_throttle()
+            detail = str(e)
+        else:
+            elapsed = time.monotonic() - started
+            if is_empty is None or not is_empty(result):
+                bucket.on_success()
+                return result, elapsed
+            if attempt >= empty_retries:
+                if bucket.recently_throttled():
+                    raise UpstreamThrottled(host, "empty response")
+                return result, elapsed
+            detail = "empty response"
+            if not bucket.recently_throttled():
+                # A truly empty result is retried for free; only throttling spends the budget
+                time.sleep(backoff_delay(attempt))
+                continue
+
+        if budget is not None and not budget.consume():
+            raise UpstreamThrottled(host, f"retry budget exhausted ({detail})")
+        delay = backoff_delay(attempt)
+        logger.info(f"Retrying {host} call in {delay:.2f}s (attempt {attempt + 1}: {detail})")
+        time.sleep(delay)
+
+    raise UpstreamThrottled(host, detail)
+
+
+def _is_empty_frame(value) -> bool:
+    return value is None or getattr(value, "empty", False)
+
+
+def yf_attr(stock, attr: str, budget: Optional[RetryBudget] = None):
+    """
+    Read a (network-backed) attribute of a ``yf.Ticker`` under the yfinance limiter.
+
+    yfinance caches statements on the Ticker, including empty ones, so retries
+    use a fresh Ticker for the same symbol.
+    """
+    def fetch(attempt):
+        target = stock if attempt == 0 else yf.Ticker(stock.ticker)
+        return getattr(target, attr)
+
+    is_empty = None if attr in ("info", "fast_info") else _is_empty_frame
+    return call_upstream("yfinance", fetch, budget=budget, is_empty=is_empty)
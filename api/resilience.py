@@ -0,0 +1,173 @@
+"""
+Circuit breakers for upstream hosts, and the pieces for serving stale results.
+
+``call_upstream`` checks the host's ``CircuitBreaker`` before every call and
+reports the outcome afterwards. After ``failure_threshold`` consecutive failed
+calls the circuit opens: calls fail at once with ``CircuitOpenError`` instead
+of waiting on a host that is down. A call fails if it errors with a throttle
+or 5xx status, a connection error or a timeout, or if it succeeds but takes
+longer than ``slow_call`` seconds. After ``reset_timeout`` seconds a single
+probe call is let through; if it succeeds the circuit closes again.
+
+While a circuit is open the API serves the last good result for a ticker
+(``ResultCache``) with its age, and ``Revalidator`` recomputes it in the
+background, at most once per ticker at a time.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5))
+RESET_TIMEOUT = float(os.environ.get('CIRCUIT_RESET_TIMEOUT', 30.0))
+SLOW_CALL = float(os.environ.get('CIRCUIT_SLOW_CALL', 10.0))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"{host} circuit is open (retry in {retry_in:.0f}s)")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Thread-safe closed / open / half-open breaker for one upstream host."""
+
+    def __init__(self, host: str, failure_threshold: int = FAILURE_THRESHOLD,
+                 reset_timeout: float = RESET_TIMEOUT, slow_call: float = SLOW_CALL):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call = slow_call
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def retry_in(self) -> float:
+        """Seconds until the next probe is allowed (0 unless open)"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    @property
+    def closed(self) -> bool:
+        """False while the host is failing, including while a probe is pending"""
+        return self.state == CLOSED
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go ahead."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and self.retry_in() == 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                logger.info(f"{self.host} circuit half-open, probing")
+                return
+            raise CircuitOpenError(self.host, max(self.retry_in(), 1.0))
+
+    def on_success(self, elapsed: float = 0.0) -> None:
+        if elapsed > self.slow_call:
+            self.on_failure(f"slow call ({elapsed:.1f}s)")
+            return
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"{self.host} circuit closed")
+            self.state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def on_failure(self, detail: str = "") -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"{self.host} circuit opened after {self._failures} failures: {detail}")
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'state': self.state, 'failures': self._failures, 'retry_in': round(self.retry_in(), 1)}
+
+
+BREAKERS: Dict[str, CircuitBreaker] = {
+    "yfinance": CircuitBreaker("yfinance"),
+    "news.google.com": CircuitBreaker("news.google.com"),
+}
+
+
+def is_outage(exc: Exception, is_throttle: bool) -> bool:
+    """Whether an upstream error says something about the host rather than the request"""
+    if is_throttle:
+        return True
+    response = getattr(exc, "response", None)
+    if isinstance(getattr(response, "status_code", None), int):
+        return False  # other 4xx: a bad symbol or URL, not an outage
+    return isinstance(exc, (OSError, TimeoutError)) or "Timeout" in type(exc).__name__
+
+
+class ResultCache:
+    """Thread-safe LRU map of key -> (last good value, time it was stored)."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key: str, value: dict, stored_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time() if stored_at is None else stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Tuple[dict, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+
+class Revalidator:
+    """Runs background refreshes, at most one in flight per key."""
+
+    def __init__(self, max_workers: int = 2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='revalidate')
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, refresh: Callable[[], None]) -> bool:
+        """Schedule ``refresh`` unless one for ``key`` is already running; True if scheduled."""
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            self._in_flight.add(key)
+
+        def run():
+            try:
+                refresh()
+            except Exception as e:
+                logger.info(f"Background refresh of {key} failed: {e}")
+            finally:
+                with self._lock:
+                    self._in_flight.discard(key)
+
+        self._executor.submit(run)
+        return True
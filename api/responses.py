@@ -0,0 +1,86 @@
+"""
+JSON responses for the larger endpoints: fast encoding, negotiated compression
+and an optional columnar shape.
+
+Bodies are encoded with orjson when it is installed (stdlib json otherwise).
+Bodies of at least COMPRESS_MIN_BYTES are compressed with brotli or gzip,
+whichever the client's Accept-Encoding prefers; brotli is only offered when
+the brotli package is installed.
+"""
+import gzip
+import json
+import logging
+import os
+from typing import Dict, List
+
+from flask import Response, request
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    logger.info("orjson not available. Using the standard json encoder.")
+    ORJSON_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    logger.info("brotli not available. Compressing responses with gzip only.")
+    BROTLI_AVAILABLE = False
+
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def dumps(payload) -> bytes:
+    """Encode a payload as UTF-8 JSON"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def _negotiate_encoding() -> str:
+    offered = ['br', 'gzip'] if BROTLI_AVAILABLE else ['gzip']
+    return request.accept_encodings.best_match(offered) or 'identity'
+
+
+def json_response(payload, status: int = 200) -> Response:
+    """Encode ``payload`` and compress it if it is large and the client accepts it"""
+    body = dumps(payload)
+    headers = {'Vary': 'Accept-Encoding'}
+    if len(body) >= COMPRESS_MIN_BYTES:
+        encoding = _negotiate_encoding()
+        if encoding == 'br':
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+        elif encoding == 'gzip':
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+    return Response(body, status=status, mimetype='application/json', headers=headers)
+
+
+def to_columnar(results: Dict[str, dict]) -> dict:
+    """
+    Turn {ticker: {field: value | {subfield: value}}} into arrays per field.
+
+    Nested objects become one array per subfield, e.g.
+    {'tickers': ['AAPL', ...], 'credit_scores': {'base_score': [71.2, ...]}}.
+    Fields missing for a ticker are null.
+    """
+    tickers = list(results)
+    columns: dict = {'tickers': tickers}
+    fields: List[str] = list(dict.fromkeys(field for analysis in results.values() for field in analysis))
+    for field in fields:
+        values = [results[ticker].get(field) for ticker in tickers]
+        if all(value is None or isinstance(value, dict) for value in values):
+            subfields = list(dict.fromkeys(key for value in values if value for key in value))
+            columns[field] = {
+                key: [value.get(key) if value else None for value in values] for key in subfields
+            }
+        else:
+            columns[field] = values
+    return columns
@@ -0,0 +1,223 @@
+"""
+Memory-mapped, read-only store of precomputed scores and ratios.
+
+The store is a single ``.npy`` file holding a structured array sorted by ticker.
+Readers map it with ``np.load(mmap_mode='r')``, so every Flask worker shares the
+same page-cache pages, and a lookup is a binary search over the ticker column
+(O(log n)) followed by a single row read.
+
+A batch job rebuilds the file next to the live one and swaps it in with
+``os.replace``. Readers notice the new inode on their next check and remap;
+requests already holding the old mapping keep reading the old file safely.
+
+Scores computed by a rebuild are offered to the change feed (``--change-feed``,
+default ``CHANGE_FEED_PATH``) as they are computed; reads from the store are not,
+since they only repeat what the rebuild recorded.
+
+Usage:
+    python score_store.py --tickers-file universe.txt --out scores.npy
+"""
+import argparse
+import asyncio
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from lazy_imports import lazy_import
+from async_fetch import analyze_tickers_async
+from change_feed import ChangeLog
+from quotes import LISTING_CHECKS_PATH, load_listing_checks, save_listing_checks
+from quantile_sketch import UniverseNormalizer
+from fetch_extra_ratios import RATIO_NAMES, format_ratios
+
+logger = logging.getLogger(__name__)
+
+np = lazy_import("numpy")
+
+TICKER_BYTES = 12
+NAME_BYTES = 96
+
+SCORE_FIELDS = ['base_score', 'score_min', 'score_max', 'altman_z', 'ohlson_o', 'sentiment']
+
+@lru_cache(maxsize=None)
+def store_dtype():
+    """Row layout of the store file."""
+    return np.dtype(
+        [('ticker', f'S{TICKER_BYTES}'), ('company_name', f'S{NAME_BYTES}'), ('grade', 'S3')]
+        + [(name, '<f8') for name in SCORE_FIELDS]
+        + [('ratios', '<f8', (len(RATIO_NAMES),)), ('computed_at', '<f8')]
+    )
+
+
+def _encode(text: str, size: int) -> bytes:
+    data = text.encode('utf-8')[:size]
+    # Don't leave a partial multi-byte character at the cut
+    return data.decode('utf-8', errors='ignore').encode('utf-8')
+
+
+def build_store(analyses: Dict[str, dict], path: str, computed_at: Optional[float] = None) -> int:
+    """
+    Write analyses (as returned by ``analyze_tickers_async(..., numeric_ratios=True)``)
+    to a new store file and atomically replace ``path`` with it.
+
+    Returns:
+        int: Number of tickers in the store.
+    """
+    computed_at = time.time() if computed_at is None else computed_at
+    rows = np.zeros(len(analyses), dtype=store_dtype())
+    for i, ticker in enumerate(analyses):
+        analysis = analyses[ticker]
+        scores = analysis['credit_scores']
+        ratios = analysis.get('financial_ratios') or {}
+        row = rows[i]
+        row['ticker'] = _encode(ticker, TICKER_BYTES)
+        row['company_name'] = _encode(analysis.get('company_name') or '', NAME_BYTES)
+        row['grade'] = scores['grade'].encode('ascii')
+        for name in SCORE_FIELDS:
+            row[name] = scores[name]
+        row['ratios'] = [np.nan if ratios.get(name) is None else ratios[name] for name in RATIO_NAMES]
+        row['computed_at'] = computed_at
+    rows.sort(order='ticker')
+
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, rows, allow_pickle=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    logger.info(f"Built score store with {len(rows)} tickers at {path}")
+    return len(rows)
+
+
+class ScoreStore:
+    """Read-only view of a store file that follows atomic swaps."""
+
+    def __init__(self, path: str, max_age: float = 3600.0, check_interval: float = 1.0):
+        self.path = path
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self._rows = None
+        self._file_id = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _current_rows(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._rows
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return self._rows
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._rows, self._file_id = None, None
+                return None
+            file_id = (stat.st_ino, stat.st_mtime_ns)
+            if file_id != self._file_id:
+                self._rows = np.load(self.path, mmap_mode='r', allow_pickle=False)
+                self._file_id = file_id
+                logger.info(f"Mapped score store {self.path} ({len(self._rows)} tickers)")
+            return self._rows
+
+    def get(self, ticker: str, max_age: Optional[float] = None) -> Optional[dict]:
+        """
+        Look up a ticker. Returns None if it is missing or older than ``max_age``
+        (default: the store's).
+
+        The result has the same ``company_name`` / ``credit_scores`` /
+        ``financial_ratios`` shape as the live analysis.
+        """
+        rows = self._current_rows()
+        if rows is None or len(rows) == 0:
+            return None
+        key = ticker.encode('ascii', errors='ignore')[:TICKER_BYTES]
+        tickers = rows['ticker']
+        i = int(np.searchsorted(tickers, key))
+        if i >= len(rows) or tickers[i] != key:
+            return None
+        row = rows[i]
+        computed_at = float(row['computed_at'])
+        if time.time() - computed_at > (self.max_age if max_age is None else max_age):
+            return None
+
+        ratios = row['ratios']
+        values = {name: (None if np.isnan(v) else float(v)) for name, v in zip(RATIO_NAMES, ratios)}
+        return {
+            'company_name': bytes(row['company_name']).decode('utf-8'),
+            'credit_scores': {
+                **{name: float(row[name]) for name in SCORE_FIELDS},
+                'grade': bytes(row['grade']).decode('ascii'),
+            },
+            'financial_ratios': format_ratios(values),
+            'computed_at': computed_at,
+        }
+
+
+def rebuild(
+    tickers: Iterable[str],
+    path: str,
+    chunk_size: int = 200,
+    sketch_in: Optional[str] = None,
+    change_log: Optional[ChangeLog] = None,
+) -> int:
+    """
+    Score ``tickers`` and swap a freshly built store into ``path``.
+
+    Scores are normalized against the universe sketch at ``sketch_in`` if
+    given, the fixed bounds otherwise, like the live API. Each new score is
+    recorded in ``change_log`` if given.
+    """
+    tickers = [t.strip().upper() for t in tickers if t.strip()]
+    normalizer = UniverseNormalizer.load(sketch_in, learn=False) if sketch_in else None
+    analyses: Dict[str, dict] = {}
+    for start in range(0, len(tickers), chunk_size):
+        chunk = tickers[start:start + chunk_size]
+        scored = asyncio.run(analyze_tickers_async(chunk, numeric_ratios=True, normalizer=normalizer))
+        if change_log is not None:
+            for ticker, analysis in scored.items():
+                change_log.record(ticker, analysis['credit_scores'])
+        analyses.update(scored)
+        logger.info(f"Scored {min(start + chunk_size, len(tickers))} of {len(tickers)} tickers")
+    return build_store(analyses, path)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the memory-mapped score store.")
+    parser.add_argument('--tickers', help="Comma-separated ticker symbols")
+    parser.add_argument('--tickers-file', help="File with one ticker per line")
+    parser.add_argument('--out', required=True, help="Store path (replaced atomically)")
+    parser.add_argument('--sketch-in', help="Universe sketch to normalize scores against")
+    parser.add_argument('--listing-checks', default=LISTING_CHECKS_PATH,
+                        help="Listing checks file to reuse and update (default: $LISTING_CHECKS_PATH)")
+    parser.add_argument('--change-feed', default=os.environ.get('CHANGE_FEED_PATH'),
+                        help="Change feed file to record new scores in (default: $CHANGE_FEED_PATH)")
+    args = parser.parse_args(argv)
+
+    tickers: List[str] = []
+    if args.tickers:
+        tickers += args.tickers.split(',')
+    if args.tickers_file:
+        with open(args.tickers_file) as f:
+            tickers += f.read().split()
+    if not tickers:
+        parser.error("one of --tickers or --tickers-file is required")
+
+    logging.basicConfig(level=logging.INFO)
+    change_log = ChangeLog(
+        args.change_feed, delta=float(os.environ.get('SCORE_EVENT_DELTA', 1.0))
+    ) if args.change_feed else None
+    if args.listing_checks:
+        load_listing_checks(args.listing_checks)
+    count = rebuild(tickers, args.out, sketch_in=args.sketch_in, change_log=change_log)
+    if args.listing_checks:
+        save_listing_checks(args.listing_checks)
+    print(f"Stored {count} tickers in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
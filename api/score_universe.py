@@ -0,0 +1,287 @@
+"""
+Score a large ticker universe across all cores.
+
+The universe is split into fixed-size shards that a process pool scores in
+parallel. Each worker process loads the sentiment model once (at start-up) and
+scores its shards through the async fetch layer, so upstream I/O overlaps
+within a shard while pandas/model work runs in parallel across shards.
+
+Every finished shard is checkpointed to its own JSON file. Re-running the same
+command resumes: shards with a valid checkpoint are skipped. Tickers that
+failed for a transient reason (throttled, or upstream unavailable) are not
+final, though: their shards are scored again, for those tickers only, up to
+--retries more times per run after a pause, and again on the next run. The
+final output merges all shards in ticker order, so it is identical whichever
+order the shards finished in.
+
+Each shard also records a quantile sketch of its Altman Z and Ohlson O scores
+(see ``quantile_sketch``); the shard sketches are merged into one universe
+sketch, written with --sketch-out. Passing a previous run's sketch with
+--sketch-in normalizes this run's scores to percentiles of that universe.
+
+With --listing-checks (default LISTING_CHECKS_PATH) the ADR / currency verdicts
+of ``quotes.statement_values_usable`` are read from that file at start and the
+new ones are saved to it, so only tickers never checked before download
+``info`` for it.
+
+Each process has its own rate limiter (see ``rate_limit``), so every worker
+gets an equal share of the per-host rates; the buckets still adapt to
+throttling independently. Those rates (--yfinance-rate and --news-rate, by
+default YFINANCE_RATE / NEWS_RATE or 10 and 2 requests per second) are for the
+whole job and bound its throughput: once they are reached, more workers only
+add CPU for scoring. Scoring a ticker takes two or three yfinance requests and
+one news request, so at the defaults news limits a run to about 2 tickers/s.
+
+Usage:
+    python score_universe.py --tickers-file universe.txt --out scores.json --workers 8 \
+        --sketch-out universe_sketch.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fetch_and_score import FAILURE_THROTTLED, FAILURE_UNAVAILABLE
+from quantile_sketch import UniverseNormalizer
+from quotes import LISTING_CHECKS_PATH, listing_checks, load_listing_checks, save_listing_checks
+from resilience import RESET_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD_SIZE = 100
+DEFAULT_RETRIES = 1
+# Failures worth another attempt later, unlike no_data and error
+TRANSIENT_FAILURES = {FAILURE_THROTTLED, FAILURE_UNAVAILABLE}
+
+
+def _init_worker(
+    processes: int, listing_checks_path: Optional[str] = None, rates: Optional[Dict[str, float]] = None
+) -> None:
+    # The upstream limits are for the whole job, not per process
+    from rate_limit import BUCKETS, set_rate
+    for host, rate in (rates or {}).items():
+        set_rate(host, rate)
+    for bucket in BUCKETS.values():
+        bucket.split(processes)
+    if listing_checks_path:
+        load_listing_checks(listing_checks_path)
+    # Build the sentiment model once per process, before the first shard
+    from unstructured import get_sentiment_model
+    get_sentiment_model()
+    logging.basicConfig(level=logging.WARNING)
+
+
+def _write_json(path: str, payload: dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _checkpoint_path(checkpoint_dir: str, index: int) -> str:
+    return os.path.join(checkpoint_dir, f"shard-{index:05d}.json")
+
+
+def _load_checkpoint(path: str, tickers: List[str]) -> Optional[dict]:
+    """Return a checkpoint if it exists and covers exactly ``tickers``."""
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return checkpoint if checkpoint.get('tickers') == tickers else None
+
+
+def _transient_failures(checkpoint: dict) -> List[str]:
+    return [ticker for ticker, reason in checkpoint['failures'].items() if reason in TRANSIENT_FAILURES]
+
+
+def _results_sketch(results: Dict[str, dict]) -> UniverseNormalizer:
+    sketch = UniverseNormalizer()
+    for scores in results.values():
+        sketch.update(scores['altman_z'], scores['ohlson_o'])
+    return sketch
+
+
+def _score_shard(
+    index: int, tickers: List[str], checkpoint_path: str, sketch_in: Optional[str] = None
+) -> Tuple[int, int, Dict[str, str]]:
+    """Score a shard, or only the transiently failed tickers of its existing checkpoint."""
+    from async_fetch import fetch_and_compute_credit_scores_async
+
+    normalizer = UniverseNormalizer.load(sketch_in, learn=False) if sketch_in else None
+    previous = _load_checkpoint(checkpoint_path, tickers)
+    retry = _transient_failures(previous) if previous else tickers
+    failures: Dict[str, str] = {}
+    results = asyncio.run(fetch_and_compute_credit_scores_async(retry, failures=failures, normalizer=normalizer))
+    if previous:
+        results = {**previous['results'], **results}
+        failures = {
+            **{t: reason for t, reason in previous['failures'].items() if t not in retry},
+            **failures,
+        }
+    _write_json(checkpoint_path, {
+        'tickers': tickers,
+        'results': results,
+        'failures': failures,
+        'sketch': _results_sketch(results).to_dict(),
+        'listing_checks': {**(previous or {}).get('listing_checks', {}), **listing_checks(tickers)},
+    })
+    return index, len(results), failures
+
+
+def shard_tickers(tickers: List[str], shard_size: int) -> List[List[str]]:
+    """Deduplicate (keeping first occurrence) and split into fixed-size shards."""
+    unique = list(dict.fromkeys(t.strip().upper() for t in tickers if t.strip()))
+    return [unique[i:i + shard_size] for i in range(0, len(unique), shard_size)]
+
+
+def score_universe(
+    tickers: List[str],
+    out_path: str,
+    checkpoint_dir: Optional[str] = None,
+    workers: Optional[int] = None,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    sketch_in: Optional[str] = None,
+    sketch_out: Optional[str] = None,
+    retries: int = DEFAULT_RETRIES,
+    listing_checks_path: Optional[str] = None,
+    rates: Optional[Dict[str, float]] = None,
+) -> dict:
+    """
+    Score ``tickers`` on a process pool and write the merged results to ``out_path``.
+
+    ``sketch_in`` is a universe sketch to normalize against; the merged sketch
+    of this run's scores is written to ``sketch_out``. Shards with throttled or
+    unavailable tickers are retried up to ``retries`` times. Listing checks
+    are reused from and saved to ``listing_checks_path``. ``rates`` overrides
+    the job-wide requests per second of some hosts (see ``rate_limit.RATES``).
+
+    Returns:
+        dict: Summary with ticker, scored and failure counts.
+    """
+    checkpoint_dir = checkpoint_dir or f"{out_path}.shards"
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    shards = shard_tickers(tickers, shard_size)
+    total_tickers = sum(len(shard) for shard in shards)
+
+    def unfinished() -> List[int]:
+        pending = []
+        for i, shard in enumerate(shards):
+            checkpoint = _load_checkpoint(_checkpoint_path(checkpoint_dir, i), shard)
+            if checkpoint is None or _transient_failures(checkpoint):
+                pending.append(i)
+        return pending
+
+    pending = unfinished()
+    if len(pending) < len(shards):
+        logger.info(f"Resuming: {len(shards) - len(pending)} of {len(shards)} shards already complete")
+
+    if pending:
+        processes = min(workers or os.cpu_count() or 1, len(pending))
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(processes, listing_checks_path, rates)) as pool:
+            for attempt in range(retries + 1):
+                if attempt:
+                    logger.info(f"Retrying {len(pending)} shards with throttled or unavailable tickers "
+                                f"in {RESET_TIMEOUT:.0f}s")
+                    time.sleep(RESET_TIMEOUT)
+                start = time.monotonic()
+                futures = [
+                    pool.submit(_score_shard, i, shards[i], _checkpoint_path(checkpoint_dir, i), sketch_in)
+                    for i in pending
+                ]
+                for finished, future in enumerate(as_completed(futures), 1):
+                    index, scored, failures = future.result()
+                    elapsed = time.monotonic() - start
+                    eta = elapsed / finished * (len(pending) - finished)
+                    logger.info(
+                        f"Shard {index} done: {scored}/{len(shards[index])} scored, "
+                        f"{len(failures)} failed ({finished}/{len(pending)} shards, "
+                        f"{elapsed:.0f}s elapsed, ETA {eta:.0f}s)"
+                    )
+                pending = unfinished()
+                if not pending:
+                    break
+
+    # Merge in ticker order so the output does not depend on completion order
+    results: Dict[str, dict] = {}
+    failures: Dict[str, str] = {}
+    universe = UniverseNormalizer()
+    checks: Dict[str, bool] = {}
+    for i, shard in enumerate(shards):
+        checkpoint = _load_checkpoint(_checkpoint_path(checkpoint_dir, i), shard)
+        checks.update(checkpoint.get('listing_checks', {}))
+        results.update(checkpoint['results'])
+        failures.update(checkpoint['failures'])
+        if 'sketch' in checkpoint:
+            universe.merge(UniverseNormalizer.from_dict(checkpoint['sketch']))
+        else:
+            universe.merge(_results_sketch(checkpoint['results']))
+    results = dict(sorted(results.items()))
+    failures = dict(sorted(failures.items()))
+
+    summary = {
+        'tickers': total_tickers,
+        'scored': len(results),
+        'failed': len(failures),
+        'failure_reasons': dict(Counter(failures.values())),
+        'shards': len(shards),
+    }
+    _write_json(out_path, {
+        'generated_at': datetime.now().isoformat(),
+        'results': results,
+        'failures': failures,
+        'summary': summary,
+    })
+    if sketch_out:
+        universe.save(sketch_out)
+    if listing_checks_path:
+        save_listing_checks(listing_checks_path, checks)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Score a ticker universe on all cores.")
+    parser.add_argument('--tickers-file', required=True, help="File with one ticker per line")
+    parser.add_argument('--out', required=True, help="Merged JSON output path")
+    parser.add_argument('--checkpoint-dir', help="Per-shard checkpoints (default: <out>.shards)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help="Tickers per shard")
+    parser.add_argument('--sketch-in', help="Universe sketch to normalize scores against")
+    parser.add_argument('--sketch-out', help="Write the merged quantile sketch of this run's scores here")
+    parser.add_argument('--listing-checks', default=LISTING_CHECKS_PATH,
+                        help="Listing checks file to reuse and update (default: $LISTING_CHECKS_PATH)")
+    parser.add_argument('--yfinance-rate', type=float,
+                        help="Job-wide yfinance requests per second (default: $YFINANCE_RATE or 10)")
+    parser.add_argument('--news-rate', type=float,
+                        help="Job-wide Google News requests per second (default: $NEWS_RATE or 2)")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help="Extra passes over shards with throttled or unavailable tickers")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.tickers_file) as f:
+        tickers = f.read().split()
+
+    summary = score_universe(
+        tickers, args.out, args.checkpoint_dir, args.workers, args.shard_size,
+        args.sketch_in, args.sketch_out, args.retries, args.listing_checks,
+        {host: rate for host, rate in (('yfinance', args.yfinance_rate), ('news.google.com', args.news_rate))
+         if rate is not None},
+    )
+    print(f"Scored {summary['scored']} of {summary['tickers']} tickers "
+          f"across {summary['shards']} shards -> {args.out}")
+    if summary['failed']:
+        reasons = ", ".join(f"{reason}: {count}" for reason, count in sorted(summary['failure_reasons'].items()))
+        print(f"Failed: {summary['failed']} ({reasons})")
+
+
+if __name__ == "__main__":
+    main()
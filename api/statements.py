@@ -0,0 +1,155 @@
+"""
+Compact in-memory form of the yfinance financial statements.
+
+yfinance returns each statement as a DataFrame with an object index of 60-150
+line items, of which the models read a dozen. ``CompactStatement`` keeps only
+the rows that can match a line item in CANONICAL_ITEMS, as a float64 array
+(rows x periods, most recent period first) plus a label -> row map. The fetch
+step converts each frame as soon as it arrives, so the DataFrames can be freed
+while a ticker waits for its other inputs.
+"""
+from __future__ import annotations
+
+import re
+import sys
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from lazy_imports import lazy_import
+from rate_limit import RetryBudget, yf_attr
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Line items read by fetch_and_score.score_financials,
+# fetch_extra_ratios.compute_ratio_values and quotes. A row is kept if its normalized
+# label equals or contains one of these, which covers both the exact and the
+# substring matching those modules do. Add new items here when a model starts
+# reading them.
+CANONICAL_ITEMS = (
+    # Balance sheet
+    "Total Assets", "TotalAssets", "Assets",
+    "Total Liab", "Total Liabilities", "TotalLiabilities",
+    "Total Stockholder Equity", "Total Stockholders' Equity", "Stockholders Equity",
+    "Shareholders Equity", "Total Equity", "Total Equity Gross Minority Interest",
+    "Total Current Assets", "TotalCurrentAssets", "Current Assets",
+    "Total Current Liabilities", "TotalCurrentLiabilities", "Current Liabilities",
+    "Retained Earnings", "RetainedEarnings",
+    "Inventory", "Inventories",
+    "Cash And Cash Equivalents", "Cash And Cash Equivalents, at Carrying Value", "Cash",
+    "Short Term Investments", "Marketable Securities",
+    "Net Receivables", "Accounts Receivable", "Accounts Receivable Net Current",
+    "Short Long Term Debt", "Short-Term Debt", "Short Term Debt", "Current Debt",
+    "Long Term Debt", "Long-Term Debt", "Long Term Debt Noncurrent",
+    "Long Term Debt And Capital Lease Obligation",
+    "Ordinary Shares Number", "Share Issued",
+    # Income statement
+    "Total Revenue", "TotalRevenue", "Revenue", "Net Sales",
+    "Net Income", "NetIncome", "Net Income Common Stockholders", "Net Income Applicable To Common Shares",
+    "EBIT", "Ebit", "Operating Income", "OperatingIncome",
+    "Diluted EPS",
+)
+
+
+def normalize_label(label) -> str:
+    """Normalize a line-item name for matching (case/space/punct insensitive)."""
+    if label is None:
+        return ""
+    return re.sub(r"[^a-z0-9]", "", str(label).lower())
+
+
+_CANONICAL_NORMALIZED = frozenset(normalize_label(item) for item in CANONICAL_ITEMS)
+
+
+@lru_cache(maxsize=4096)
+def _is_canonical(label: str) -> bool:
+    normalized = normalize_label(label)
+    return any(item in normalized for item in _CANONICAL_NORMALIZED)
+
+
+class CompactStatement:
+    """A financial statement reduced to the canonical line items."""
+
+    __slots__ = ("labels", "periods", "values", "_rows")
+
+    def __init__(self, labels: List[str], periods: List[str], values):
+        self.labels = labels
+        self.periods = periods
+        self.values = values
+        self._rows = {label: i for i, label in enumerate(labels)}
+
+    @classmethod
+    def from_frame(cls, df, items: Optional[Iterable[str]] = None) -> "CompactStatement":
+        """
+        Reduce a yfinance statement DataFrame (None/empty gives an empty
+        statement) to the rows matching ``items`` (default CANONICAL_ITEMS).
+        """
+        if df is None or df.empty:
+            return cls([], [], np.empty((0, 0)))
+
+        if items is None:
+            keep = _is_canonical
+        else:
+            wanted = {normalize_label(item) for item in items}
+            keep = lambda label: any(w in normalize_label(label) for w in wanted)
+        seen = set()
+        rows, labels = [], []
+        for i, label in enumerate(df.index):
+            label = str(label)
+            if label not in seen and keep(label):
+                seen.add(label)
+                rows.append(i)
+                labels.append(sys.intern(label))  # shared across tickers
+
+        # Most recent period first; columns that are not dates keep their order at the end
+        dates = pd.to_datetime(pd.Index(df.columns), errors="coerce")
+        dated = sorted((i for i in range(len(dates)) if not pd.isna(dates[i])), key=lambda i: dates[i], reverse=True)
+        columns = dated + [i for i in range(len(dates)) if pd.isna(dates[i])]
+
+        block = df.iloc[rows, columns]
+        try:
+            values = block.to_numpy(dtype=np.float64)
+        except (TypeError, ValueError):
+            values = block.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+        periods = [
+            sys.intern(dates[i].date().isoformat() if not pd.isna(dates[i]) else str(df.columns[i]))
+            for i in columns
+        ]
+        return cls(labels, periods, values)
+
+    @property
+    def empty(self) -> bool:
+        return not self.labels or not self.periods
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+    def row(self, label: str):
+        """All periods of a line item (NaN where missing), or None if absent."""
+        i = self._rows.get(label)
+        return None if i is None else self.values[i]
+
+    def latest(self, label: str) -> Optional[float]:
+        """Most recent value of a line item (may be NaN), or None if absent."""
+        row = self.row(label)
+        return None if row is None or not len(row) else float(row[0])
+
+    def reported(self, label: str) -> Dict[str, float]:
+        """{period: value} for the periods in which the line item was reported."""
+        row = self.row(label)
+        if row is None:
+            return {}
+        return {period: float(value) for period, value in zip(self.periods, row) if not np.isnan(value)}
+
+
+def fetch_statement(stock, attr: str, budget: Optional[RetryBudget] = None) -> CompactStatement:
+    """Fetch a statement attribute of a ``yf.Ticker`` and compact it straight away."""
+    return CompactStatement.from_frame(yf_attr(stock, attr, budget))
+
+
+def as_statement(statement) -> CompactStatement:
+    """Accept either a CompactStatement or a raw yfinance DataFrame."""
+    if isinstance(statement, CompactStatement):
+        return statement
+    return CompactStatement.from_frame(statement)
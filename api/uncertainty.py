@@ -0,0 +1,178 @@
+"""
+Monte Carlo confidence bands for credit scores.
+
+``score_financials`` reads nine statement fields and substitutes a default
+for each one that is missing. The band around a score should show how much the
+score depends on those inputs, so instead of a fixed ±5% the inputs are
+perturbed and Altman Z, Ohlson O and the final score are recomputed for DRAWS
+draws at once:
+
+  - reported fields get a small relative error (REPORTED_SIGMA),
+  - imputed fields get a large one (IMPUTED_SIGMA); an imputed zero is
+    perturbed relative to total assets instead (ZERO_SCALE),
+  - sentiment gets an absolute error (SENTIMENT_SIGMA).
+
+The band is the BAND percentiles of the simulated scores. All tickers share
+the same standard normal draws, generated once per process from a fixed seed,
+so bands are reproducible and differences between tickers come from their
+inputs rather than from sampling noise. Scoring a ticker is a handful of array
+operations on a (fields x draws) block; ``score_bands_batch`` does the same
+for many tickers on a (tickers x fields x draws) block.
+"""
+import os
+from functools import lru_cache
+from typing import Dict, Iterable, Sequence, Tuple
+
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+DRAWS = int(os.environ.get('UNCERTAINTY_DRAWS', 2000))
+SEED = 0
+BAND = (5, 95)
+
+REPORTED_SIGMA = 0.05
+IMPUTED_SIGMA = 0.5
+ZERO_SCALE = 0.1
+SENTIMENT_SIGMA = 0.1
+
+# Fixed normalization bounds used by score_financials when there is no universe
+ALTMAN_BOUNDS = (-3, 10)
+OHLSON_BOUNDS = (-5, 4)
+
+# Inputs in the order of the draw block, with the floors score_financials applies
+FIELDS = (
+    'total_assets', 'total_liabilities', 'current_assets', 'current_liabilities',
+    'retained_earnings', 'ebit', 'market_cap', 'revenue', 'net_income',
+)
+FLOORS = {
+    'total_assets': 1000000, 'total_liabilities': 100000, 'current_assets': 0,
+    'current_liabilities': 0, 'market_cap': 1000000, 'revenue': 0,
+}
+# Tickers per array block, which keeps a block near 10 MB at the default DRAWS
+CHUNK = 64
+
+
+@lru_cache(maxsize=4)
+def _standard_normal(draws: int):
+    """(fields + sentiment) x draws block of N(0, 1) draws, shared by every ticker"""
+    block = np.random.default_rng(SEED).standard_normal((len(FIELDS) + 1, draws))
+    block.flags.writeable = False
+    return block
+
+
+def _ratio(numerator, denominator):
+    """numerator / denominator, 0 where the denominator is 0"""
+    return np.divide(
+        numerator, denominator, out=np.zeros(np.broadcast(numerator, denominator).shape), where=denominator != 0
+    )
+
+
+def altman_z(ta, tl, wc, re, ebit, mcap, sales):
+    """Vectorized ``credtech.altman_z_score`` (0 where it would divide by zero, like the scalar one)"""
+    score = (
+        1.2 * _ratio(wc, ta) + 1.4 * _ratio(re, ta) + 3.3 * _ratio(ebit, ta)
+        + 0.6 * _ratio(mcap, tl) + 1.0 * _ratio(sales, ta)
+    )
+    return np.where((ta != 0) & (tl != 0), score, 0.0)
+
+
+def ohlson_o(ta, tl, ca, cl, wc, net_income):
+    """Vectorized ``credtech.ohlson_o_score``"""
+    leverage = _ratio(cl, ca)
+    return (
+        -1.32
+        - 0.407 * _ratio(tl, ta)
+        + 6.03 * leverage
+        - 1.43 * _ratio(wc, ta)
+        + 0.0757 * leverage
+        - 2.37 * (net_income < 0)
+    )
+
+
+def _normalize(scores, bounds):
+    low, high = bounds
+    return np.clip(100 * (scores - low) / (high - low), 0, 100)
+
+
+def _simulate(values, imputed, wc_offset, sentiment, weights, normalizer, altman_bounds, ohlson_bounds, floors):
+    """Final scores for each ticker and draw, shape (tickers, draws)"""
+    z = _standard_normal(DRAWS)
+    scale = np.abs(values)
+    scale = np.where(imputed & (values == 0), ZERO_SCALE * values[:, :1], scale)
+    sigma = np.where(imputed, IMPUTED_SIGMA, REPORTED_SIGMA) * scale
+    draws = values[:, :, None] + sigma[:, :, None] * z[None, :len(FIELDS)]
+    for i, field in enumerate(FIELDS):
+        if field in floors:
+            np.maximum(draws[:, i], floors[field], out=draws[:, i])
+    ta, tl, ca, cl, re, ebit, mcap, sales, net_income = (draws[:, i] for i in range(len(FIELDS)))
+    wc = ca - cl + wc_offset[:, None]
+    sentiment_draws = np.clip(sentiment[:, None] + SENTIMENT_SIGMA * z[len(FIELDS)], 0, 1)
+
+    altman = altman_z(ta, tl, wc, re, ebit, mcap, sales)
+    ohlson = ohlson_o(ta, tl, ca, cl, wc, net_income)
+    normalized = normalizer.normalize_arrays(altman, ohlson) if normalizer is not None else None
+    if normalized is None:
+        normalized = _normalize(altman, altman_bounds), 100 - _normalize(ohlson, ohlson_bounds)
+    altman_norm, ohlson_norm = normalized
+
+    weight_altman, weight_ohlson, weight_sentiment = weights
+    return weight_altman * altman_norm + weight_ohlson * ohlson_norm + weight_sentiment * sentiment_draws * 100
+
+
+def score_bands_batch(
+    inputs: Sequence[Dict[str, float]],
+    imputed: Sequence[Iterable[str]],
+    sentiment: Sequence[float],
+    weights: Tuple[float, float, float] = (0.50, 0.40, 0.10),
+    normalizer=None,
+    altman_bounds: Tuple[float, float] = ALTMAN_BOUNDS,
+    ohlson_bounds: Tuple[float, float] = OHLSON_BOUNDS,
+    floors: Dict[str, float] = FLOORS,
+):
+    """
+    BAND percentiles of the simulated final score for many tickers.
+
+    ``inputs`` are the FIELDS of each ticker after defaults were applied,
+    ``imputed`` the names of the fields that were defaulted. An input may
+    also give ``working_capital`` when the point estimate does not use
+    current assets - current liabilities; the difference is kept in every
+    draw. ``normalizer``
+    (a ``quantile_sketch.UniverseNormalizer``) is used when it is ready,
+    the fixed bounds otherwise. Draws are clipped at ``floors``, by default
+    the ones score_financials applies. Returns an array of shape (tickers, 2).
+    """
+    values = np.array([[float(row[field]) for field in FIELDS] for row in inputs], dtype=np.float64)
+    imputed_mask = np.array([[field in names for field in FIELDS] for names in map(set, imputed)], dtype=bool)
+    wc_offset = np.array([
+        float(row.get('working_capital', row['current_assets'] - row['current_liabilities']))
+        - (row['current_assets'] - row['current_liabilities'])
+        for row in inputs
+    ], dtype=np.float64)
+    sentiment = np.asarray(sentiment, dtype=np.float64)
+    bands = np.empty((len(values), 2))
+    for start in range(0, len(values), CHUNK):
+        block = slice(start, start + CHUNK)
+        scores = _simulate(
+            values[block], imputed_mask[block], wc_offset[block], sentiment[block], weights, normalizer,
+            altman_bounds, ohlson_bounds, floors,
+        )
+        bands[block] = np.clip(np.percentile(scores, BAND, axis=1).T, 0, 100)
+    return bands
+
+
+def score_bands(
+    inputs: Dict[str, float],
+    imputed: Iterable[str],
+    sentiment: float,
+    weights: Tuple[float, float, float] = (0.50, 0.40, 0.10),
+    normalizer=None,
+    altman_bounds: Tuple[float, float] = ALTMAN_BOUNDS,
+    ohlson_bounds: Tuple[float, float] = OHLSON_BOUNDS,
+    floors: Dict[str, float] = FLOORS,
+) -> Tuple[float, float]:
+    """``score_bands_batch`` for a single ticker; returns (low, high)."""
+    low, high = score_bands_batch(
+        [inputs], [imputed], [sentiment], weights, normalizer, altman_bounds, ohlson_bounds, floors
+    )[0]
+    return float(low), float(high)
@@ -1,103 +1,284 @@
-import feedparser
+import json
 import logging
-from typing import List
+import os
+import re
+import tempfile
+import threading
+from bisect import bisect_right
+from typing import Dict, List, Optional
+from headline_dedup import collapse_headlines, headline_weight
+from http_pool import get_bytes
+from lazy_imports import lazy_import
+from rate_limit import RetryBudget, call_upstream
 
 logger = logging.getLogger(__name__)
 
-# Try to import transformers, fallback to basic sentiment if not available
-try:
-    from transformers import pipeline
-    sentiment_model = pipeline(
-        "text-classification",
-        model="ProsusAI/finbert",
-        return_all_scores=False
-    )
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    logger.warning("Transformers not available. Using basic sentiment analysis.")
-    TRANSFORMERS_AVAILABLE = False
-except Exception as e:
-    logger.warning(f"Could not load sentiment model: {e}. Using basic sentiment analysis.")
-    TRANSFORMERS_AVAILABLE = False
-
-def basic_sentiment_score(headlines: List[str]) -> float:
+feedparser = lazy_import("feedparser")
+
+# FinBERT inference backend: "torch" (fp32), "int8" (dynamically quantized
+# torch) or "onnx" (ONNX Runtime, needs optimum[onnxruntime]). FINBERT_MODEL_DIR
+# points at a local model directory. For "onnx" the model is exported once and
+# saved to FINBERT_ONNX_DIR (default: the model directory if it is local, else
+# a directory under ~/.cache), which later loads read directly.
+SENTIMENT_BACKENDS = ("torch", "int8", "onnx")
+SENTIMENT_BACKEND = os.environ.get("SENTIMENT_BACKEND", "torch")
+FINBERT_MODEL = os.environ.get("FINBERT_MODEL_DIR", "ProsusAI/finbert")
+FINBERT_ONNX_DIR = os.environ.get("FINBERT_ONNX_DIR")
+
+def _onnx_dir(model: str) -> str:
+    if FINBERT_ONNX_DIR:
+        return FINBERT_ONNX_DIR
+    if os.path.isdir(model):
+        return model
+    return os.path.join(os.path.expanduser("~/.cache"), "finbert-onnx", model.replace("/", "--"))
+
+def _load_onnx_model(model: str):
+    """ONNX FinBERT from the export directory, exporting and saving it there on first use"""
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+
+    onnx_dir = _onnx_dir(model)
+    if os.path.isfile(os.path.join(onnx_dir, "model.onnx")):
+        return ORTModelForSequenceClassification.from_pretrained(onnx_dir)
+
+    logger.info(f"Exporting {model} to ONNX (first use); saving to {onnx_dir}")
+    classifier = ORTModelForSequenceClassification.from_pretrained(model, export=True)
+    try:
+        # Save next to the target and move the files in, model.onnx last, so a
+        # concurrent loader never sees a model.onnx without its config
+        os.makedirs(onnx_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=onnx_dir, prefix=".export-")
+        classifier.save_pretrained(staging)
+        names = sorted(os.listdir(staging), key=lambda name: name == "model.onnx")
+        for name in names:
+            os.replace(os.path.join(staging, name), os.path.join(onnx_dir, name))
+        os.rmdir(staging)
+    except OSError as e:
+        logger.warning(f"Could not save the ONNX export to {onnx_dir}: {e}; it will be exported again next time")
+    return classifier
+
+def load_sentiment_model(backend: str = "torch", model: str = FINBERT_MODEL):
+    """Build a FinBERT text-classification pipeline on the given backend"""
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+
+    if backend not in SENTIMENT_BACKENDS:
+        raise ValueError(f"Unknown sentiment backend: {backend}")
+
+    tokenizer = AutoTokenizer.from_pretrained(model)
+    if backend == "onnx":
+        classifier = _load_onnx_model(model)
+    else:
+        classifier = AutoModelForSequenceClassification.from_pretrained(model)
+        classifier.eval()
+        if backend == "int8":
+            import torch
+            classifier = torch.quantization.quantize_dynamic(
+                classifier, {torch.nn.Linear}, dtype=torch.qint8
+            )
+    return pipeline("text-classification", model=classifier, tokenizer=tokenizer)
+
+# The model is built on first use (or by warm_up), not at import time
+_sentiment_model = None
+_sentiment_model_loaded = False
+_sentiment_model_lock = threading.Lock()
+
+def get_sentiment_model():
+    """
+    Return the FinBERT pipeline, building it on first call.
+    
+    Returns None if transformers or the model is unavailable, in which case
+    callers fall back to basic sentiment analysis.
+    """
+    global _sentiment_model, _sentiment_model_loaded
+    if not _sentiment_model_loaded:
+        with _sentiment_model_lock:
+            if not _sentiment_model_loaded:
+                # Try to import transformers, fallback to basic sentiment if not available
+                try:
+                    _sentiment_model = load_sentiment_model(SENTIMENT_BACKEND, FINBERT_MODEL)
+                except ImportError as e:
+                    missing = "optimum[onnxruntime]" if e.name and e.name.startswith("optimum") else "Transformers"
+                    logger.warning(f"{missing} not available. Using basic sentiment analysis.")
+                except Exception as e:
+                    logger.warning(f"Could not load sentiment model: {e}. Using basic sentiment analysis.")
+                _sentiment_model_loaded = True
+    return _sentiment_model
+
+def sentiment_backend() -> str:
+    """Name of the sentiment method in use, for provenance in exports"""
+    if get_sentiment_model() is None:
+        return "keyword"
+    return "finbert" if SENTIMENT_BACKEND == "torch" else f"finbert-{SENTIMENT_BACKEND}"
+
+# Financial keyword lexicon for the fallback scorer: term -> weight
+# (positive = bullish, negative = bearish). Inflections are listed explicitly
+# because matching is on whole words only.
+DEFAULT_FINANCIAL_LEXICON = {
+    # bullish
+    'up': 1.0, 'rise': 1.0, 'rises': 1.0, 'rising': 1.0, 'rose': 1.0,
+    'gain': 1.0, 'gains': 1.0, 'gained': 1.0, 'growth': 1.0, 'grows': 1.0,
+    'profit': 1.0, 'profits': 1.0, 'profitable': 1.0,
+    'beat': 1.0, 'beats': 1.0, 'beat estimates': 1.5,
+    'strong': 1.0, 'stronger': 1.0, 'increase': 1.0, 'increases': 1.0, 'increased': 1.0,
+    'bull': 1.0, 'bullish': 1.0, 'rally': 1.0, 'rallies': 1.0,
+    'surge': 1.5, 'surges': 1.5, 'soar': 1.5, 'soars': 1.5,
+    'upgrade': 1.5, 'upgraded': 1.5, 'outperform': 1.0, 'record high': 1.5,
+    # bearish
+    'down': -1.0, 'fall': -1.0, 'falls': -1.0, 'falling': -1.0, 'fell': -1.0,
+    'loss': -1.0, 'losses': -1.0, 'decline': -1.0, 'declines': -1.0, 'declined': -1.0,
+    'drop': -1.0, 'drops': -1.0, 'dropped': -1.0, 'weak': -1.0, 'weaker': -1.0,
+    'decrease': -1.0, 'decreases': -1.0, 'decreased': -1.0,
+    'bear': -1.0, 'bearish': -1.0, 'crash': -1.5, 'crashes': -1.5,
+    'plunge': -1.5, 'plunges': -1.5, 'slump': -1.5, 'slumps': -1.5,
+    'downgrade': -1.5, 'downgraded': -1.5, 'miss': -1.0, 'misses': -1.0,
+    'missed estimates': -1.5, 'lawsuit': -1.0, 'probe': -1.0,
+    'default': -2.0, 'bankruptcy': -2.0,
+}
+
+class KeywordSentimentMatcher:
+    """
+    Whole-word lexicon matcher compiled into a single regex alternation.
+
+    A batch of headlines is joined and scanned in one pass; each match is
+    mapped back to its headline by offset.
+    """
+
+    def __init__(self, lexicon: Optional[Dict[str, float]] = None):
+        lexicon = DEFAULT_FINANCIAL_LEXICON if lexicon is None else lexicon
+        self.lexicon = {
+            term.strip().lower(): float(weight) for term, weight in lexicon.items() if term.strip()
+        }
+        if not self.lexicon:
+            # An empty alternation would match the empty string everywhere
+            logger.warning("Sentiment lexicon is empty; keyword sentiment will be neutral")
+            self._pattern = None
+            return
+        # Longest terms first so phrases win over the words they contain
+        terms = sorted(self.lexicon, key=len, reverse=True)
+        self._pattern = re.compile(r"\b(?:" + "|".join(re.escape(t) for t in terms) + r")\b")
+
+    def net_weights(self, headlines: List[str]) -> List[float]:
+        """Sum of matched term weights for each headline"""
+        starts = []
+        offset = 0
+        for headline in headlines:
+            starts.append(offset)
+            offset += len(headline) + 1
+        text = "\n".join(h.replace("\n", " ") for h in headlines).lower()
+
+        nets = [0.0] * len(headlines)
+        if self._pattern is None:
+            return nets
+        for match in self._pattern.finditer(text):
+            nets[bisect_right(starts, match.start()) - 1] += self.lexicon[match.group()]
+        return nets
+
+def load_lexicon(path: str) -> Dict[str, float]:
+    """Load a {term: weight} lexicon from a JSON file"""
+    with open(path) as f:
+        return {str(term): float(weight) for term, weight in json.load(f).items()}
+
+_lexicon_path = os.environ.get("SENTIMENT_LEXICON_PATH")
+keyword_matcher = KeywordSentimentMatcher(load_lexicon(_lexicon_path) if _lexicon_path else None)
+
+def basic_sentiment_score(
+    headlines: List[str],
+    matcher: Optional[KeywordSentimentMatcher] = None,
+    weights: Optional[List[float]] = None,
+) -> float:
     """Basic sentiment analysis using keyword matching as fallback"""
-    positive_words = ['up', 'rise', 'gain', 'growth', 'profit', 'beat', 'strong', 'increase', 'bull']
-    negative_words = ['down', 'fall', 'loss', 'decline', 'drop', 'weak', 'decrease', 'bear', 'crash']
+    if not headlines:
+        return 0.5
+    weights = weights or [1.0] * len(headlines)
     
     total_score = 0
-    count = 0
-    
-    for headline in headlines:
-        headline_lower = headline.lower()
-        positive_count = sum(1 for word in positive_words if word in headline_lower)
-        negative_count = sum(1 for word in negative_words if word in headline_lower)
-        
-        if positive_count > negative_count:
-            total_score += 0.7
-        elif negative_count > positive_count:
-            total_score += 0.3
+    for net, weight in zip((matcher or keyword_matcher).net_weights(headlines), weights):
+        if net > 0:
+            total_score += 0.7 * weight
+        elif net < 0:
+            total_score += 0.3 * weight
         else:
-            total_score += 0.5
-        count += 1
+            total_score += 0.5 * weight
+    
+    return total_score / sum(weights)
+
+def fetch_headlines(ticker: str, limit: int = 20, budget: Optional[RetryBudget] = None) -> List[str]:
+    """Fetch the most recent Google News headlines for a ticker"""
+    feed_url = f"https://news.google.com/rss/search?q={ticker}+stock+financial"
+    body = call_upstream("news.google.com", lambda attempt: get_bytes(feed_url), budget=budget)
+    feed = feedparser.parse(body)
+    
+    if not feed.entries:
+        logger.warning(f"No news found for {ticker}")
+        return []
     
-    return total_score / count if count > 0 else 0.5
+    return [entry.title for entry in feed.entries[:limit]]  # Limit to recent 20
 
-def news_sentiment_score(ticker: str) -> float:
+def score_headlines(ticker: str, headlines: List[str]) -> float:
     """
-    Get sentiment score for a ticker based on recent news headlines
+    Score already-fetched headlines for a ticker
+
+    Near-duplicate headlines are collapsed first; only one headline per group
+    is classified, weighted by the group's size (see ``headline_dedup``).
     
     Returns:
         float: Sentiment score between 0 and 1 (0 = negative, 1 = positive)
     """
-    try:
-        # Fetch news headlines
-        feed_url = f"https://news.google.com/rss/search?q={ticker}+stock+financial"
-        feed = feedparser.parse(feed_url)
-        
-        if not feed.entries:
-            logger.warning(f"No news found for {ticker}")
-            return 0.5  # Neutral default
-        
-        headlines = [entry.title for entry in feed.entries[:20]]  # Limit to recent 20
-        
-        if not headlines:
-            return 0.5
-        
-        if TRANSFORMERS_AVAILABLE:
-            try:
-                # Use FinBERT for financial sentiment analysis
-                results = sentiment_model(headlines)
-                
-                label_to_score = {"positive": 1.0, "neutral": 0.5, "negative": 0.0}
-                
-                scores = []
-                for headline, result in zip(headlines, results):
-                    label = result["label"].lower()
-                    confidence = result["score"]
-                    
-                    if label in label_to_score:
-                        score = label_to_score[label]
-                        # Weight by confidence
-                        weighted_score = score * confidence + 0.5 * (1 - confidence)
-                        scores.append(weighted_score)
-                        logger.debug(f"'{headline[:50]}...' -> {label} ({confidence:.3f}) = {weighted_score:.3f}")
+    if not headlines:
+        return 0.5  # Neutral default
+
+    groups = collapse_headlines(headlines)
+    unique_headlines = [headline for headline, _ in groups]
+    weights = [headline_weight(size) for _, size in groups]
+    if len(unique_headlines) < len(headlines):
+        logger.debug(f"Collapsed {len(headlines)} headlines for {ticker} into {len(unique_headlines)} stories")
+    
+    sentiment_model = get_sentiment_model()
+    if sentiment_model is not None:
+        try:
+            # Use FinBERT for financial sentiment analysis
+            results = sentiment_model(unique_headlines)
+            
+            label_to_score = {"positive": 1.0, "neutral": 0.5, "negative": 0.0}
+            
+            scores = []
+            total_weight = 0.0
+            for headline, weight, result in zip(unique_headlines, weights, results):
+                label = result["label"].lower()
+                confidence = result["score"]
                 
-                if scores:
-                    final_sentiment = sum(scores) / len(scores)
-                else:
-                    final_sentiment = 0.5
-                    
-                logger.info(f"Sentiment for {ticker}: {final_sentiment:.3f} (from {len(headlines)} headlines)")
-                return max(0.0, min(1.0, final_sentiment))
+                if label in label_to_score:
+                    score = label_to_score[label]
+                    # Weight by confidence
+                    weighted_score = score * confidence + 0.5 * (1 - confidence)
+                    scores.append(weighted_score * weight)
+                    total_weight += weight
+                    logger.debug(f"'{headline[:50]}...' -> {label} ({confidence:.3f}) = {weighted_score:.3f} x {weight:.2f}")
+            
+            if scores:
+                final_sentiment = sum(scores) / total_weight
+            else:
+                final_sentiment = 0.5
                 
-            except Exception as e:
-                logger.warning(f"Error with FinBERT model for {ticker}: {e}. Using basic sentiment.")
-                return basic_sentiment_score(headlines)
-        else:
-            # Use basic sentiment analysis
-            return basic_sentiment_score(headlines)
+            logger.info(f"Sentiment for {ticker}: {final_sentiment:.3f} "
+                        f"(from {len(unique_headlines)} stories in {len(headlines)} headlines)")
+            return max(0.0, min(1.0, final_sentiment))
             
+        except Exception as e:
+            logger.warning(f"Error with FinBERT model for {ticker}: {e}. Using basic sentiment.")
+            return basic_sentiment_score(unique_headlines, weights=weights)
+    else:
+        # Use basic sentiment analysis
+        return basic_sentiment_score(unique_headlines, weights=weights)
+
+def news_sentiment_score(ticker: str, budget: Optional[RetryBudget] = None) -> float:
+    """
+    Get sentiment score for a ticker based on recent news headlines
+    
+    Returns:
+        float: Sentiment score between 0 and 1 (0 = negative, 1 = positive)
+    """
+    try:
+        return score_headlines(ticker, fetch_headlines(ticker, budget=budget))
     except Exception as e:
         logger.error(f"Error getting sentiment for {ticker}: {e}")
         return 0.5  # Neutral default on error